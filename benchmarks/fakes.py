@@ -0,0 +1,298 @@
+"""
+Stand-ins for Pyrogram, PyTgCalls and yt-dlp
+
+install() puts fake modules into sys.modules, so bot.py and the helpers
+import them instead of the real libraries. Nothing talks to Telegram or
+YouTube: messages are recorded in memory, voice chats end their songs on
+a timer and downloads write local files.
+"""
+import os
+import sys
+import time
+import types
+import asyncio
+import hashlib
+import itertools
+
+class Latency:
+    """Simulated durations in seconds, shared by all fakes"""
+    search = 0.05
+    metadata = 0.05
+    download = 0.2
+    join = 0.05
+    send = 0.0
+    song_length = 1.0
+    audio_bytes = 64 * 1024
+
+# What the fakes were asked to do, reported by the load test
+counters = {'messages': 0, 'edits': 0, 'songs_started': 0, 'songs_ended': 0, 'downloads': 0}
+
+# Pyrogram
+
+class _Filter:
+    def __and__(self, other):
+        return self
+
+    def __or__(self, other):
+        return self
+
+class _Filters:
+    private = _Filter()
+
+    @staticmethod
+    def command(commands, prefixes="/"):
+        return _Filter()
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+    def mention(self, name=None):
+        return f"[user {self.id}](tg://user?id={self.id})"
+
+class Chat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+_message_ids = itertools.count(1)
+
+class Message:
+    """A chat message whose replies and edits are only recorded"""
+
+    def __init__(self, chat_id, text="", user_id=None):
+        self.id = next(_message_ids)
+        self.chat = Chat(chat_id)
+        self.text = text
+        self.command = text.lstrip("/").split() if text.startswith("/") else None
+        self.from_user = User(user_id) if user_id is not None else None
+
+    async def reply_text(self, text, **kwargs):
+        return await _send(self.chat.id, text)
+
+    async def edit(self, text, **kwargs):
+        await _sleep(Latency.send)
+        counters['edits'] += 1
+        self.text = text
+        return self
+
+    edit_text = edit
+
+class FloodWait(Exception):
+    def __init__(self, value):
+        super().__init__(f"A wait of {value} seconds is required")
+        self.value = value
+
+class InlineKeyboardMarkup:
+    def __init__(self, inline_keyboard):
+        self.inline_keyboard = inline_keyboard
+
+class InlineKeyboardButton:
+    def __init__(self, text, callback_data=None, url=None):
+        self.text = text
+        self.callback_data = callback_data
+        self.url = url
+
+async def _sleep(seconds):
+    if seconds:
+        await asyncio.sleep(seconds)
+
+async def _send(chat_id, text):
+    await _sleep(Latency.send)
+    counters['messages'] += 1
+    return Message(chat_id, text)
+
+class Client:
+    """Pyrogram Client that registers handlers and records sent messages"""
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.message_handlers = []
+
+    def on_message(self, *args):
+        def decorator(func):
+            self.message_handlers.append(func)
+            return func
+        return decorator
+
+    def on_callback_query(self, *args):
+        return lambda func: func
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        return self
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await _send(chat_id, text)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await _sleep(Latency.send)
+        counters['edits'] += 1
+        return Message(chat_id, text)
+
+    async def get_messages(self, chat_id, message_ids):
+        return Message(chat_id)
+
+async def idle():
+    await asyncio.Event().wait()
+
+# PyTgCalls
+
+class StreamEnded:
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+
+class AudioQuality:
+    HIGH = "high"
+
+class MediaStream:
+    def __init__(self, media_path, audio_parameters=None, ffmpeg_parameters=None, **kwargs):
+        self.media_path = media_path
+
+class Stream:
+    pass
+
+class PyTgCalls:
+    """Voice chat client that 'plays' each song for Latency.song_length seconds"""
+
+    def __init__(self, app):
+        self.app = app
+        self.handlers = []
+        # Chats the assistant is in -> timer ending the current song (None once it ended)
+        self.calls = {}
+
+    def on_update(self, *filters):
+        def decorator(func):
+            self.handlers.append(func)
+            return func
+        return decorator
+
+    async def start(self):
+        return self
+
+    async def join_group_call(self, chat_id, stream):
+        await _sleep(Latency.join)
+        self._play(chat_id)
+
+    async def change_stream(self, chat_id, stream):
+        if chat_id not in self.calls:
+            raise Exception("Group call not found")
+        self._play(chat_id)
+
+    async def leave_group_call(self, chat_id):
+        if chat_id not in self.calls:
+            raise Exception("Group call not found")
+        timer = self.calls.pop(chat_id)
+        if timer is not None:
+            timer.cancel()
+
+    async def pause_stream(self, chat_id):
+        pass
+
+    async def resume_stream(self, chat_id):
+        pass
+
+    def _play(self, chat_id):
+        """Start a song and schedule its StreamEnded update"""
+        timer = self.calls.get(chat_id)
+        if timer is not None:
+            timer.cancel()
+        counters['songs_started'] += 1
+        self.calls[chat_id] = asyncio.get_running_loop().call_later(
+            Latency.song_length, self._end, chat_id
+        )
+
+    def _end(self, chat_id):
+        """Deliver StreamEnded to the registered handlers, like PyTgCalls does"""
+        # Still in the voice chat, just not playing anything
+        self.calls[chat_id] = None
+        counters['songs_ended'] += 1
+        for handler in self.handlers:
+            asyncio.ensure_future(handler(self, StreamEnded(chat_id)))
+
+# yt-dlp
+
+def video_id_for(text):
+    """Stable 11 character video ID for a query or song number"""
+    return hashlib.sha1(text.encode()).hexdigest()[:11]
+
+def fixture_info(video_id, title=None):
+    """Metadata for a fixture video"""
+    return {
+        'id': video_id,
+        'title': title or f"Fixture song {video_id}",
+        'duration': 180 + int(video_id[:2], 16),
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'ext': 'webm',
+        'url': f"https://media.invalid/{video_id}.webm",
+    }
+
+class YoutubeDL:
+    """yt-dlp stand-in serving fixture metadata and writing local audio files"""
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=False):
+        if url.startswith("ytsearch"):
+            limit, query = url[len("ytsearch"):].split(":", 1)
+            time.sleep(Latency.search)
+            entries = [
+                fixture_info(video_id_for(f"{query}#{i}"), f"{query} ({i})")
+                for i in range(int(limit or 1))
+            ]
+            return {'entries': entries}
+        
+        video_id = url.rsplit("v=", 1)[-1]
+        info = fixture_info(video_id)
+        if not download:
+            time.sleep(Latency.metadata)
+            return info
+        
+        # Download in a few chunks so progress hooks run, like the real thing
+        counters['downloads'] += 1
+        home = self.params.get('paths', {}).get('home', ".")
+        os.makedirs(home, exist_ok=True)
+        path = os.path.join(home, f"{video_id}.webm")
+        chunks = 4
+        with open(path, "wb") as f:
+            for _ in range(chunks):
+                time.sleep(Latency.download / chunks)
+                for hook in self.params.get('progress_hooks', []):
+                    hook({'status': 'downloading', 'filename': path})
+                f.write(b"\0" * (Latency.audio_bytes // chunks))
+        info['requested_downloads'] = [{'filepath': path}]
+        return info
+
+    def prepare_filename(self, info):
+        home = self.params.get('paths', {}).get('home', ".")
+        return os.path.join(home, f"{info['id']}.{info['ext']}")
+
+    def close(self):
+        pass
+
+# Installing the fakes
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+def install():
+    """Replace pyrogram, pytgcalls and yt_dlp with the fakes, before bot.py is imported"""
+    pyrogram = _module("pyrogram", Client=Client, filters=_Filters(), idle=idle)
+    pyrogram.types = _module(
+        "pyrogram.types",
+        Message=Message,
+        InlineKeyboardMarkup=InlineKeyboardMarkup,
+        InlineKeyboardButton=InlineKeyboardButton,
+    )
+    pyrogram.errors = _module("pyrogram.errors", FloodWait=FloodWait)
+    pytgcalls = _module("pytgcalls", PyTgCalls=PyTgCalls)
+    pytgcalls.types = _module(
+        "pytgcalls.types", StreamEnded=StreamEnded, MediaStream=MediaStream, AudioQuality=AudioQuality
+    )
+    pytgcalls.types.raw = _module("pytgcalls.types.raw", Stream=Stream)
+    _module("yt_dlp", YoutubeDL=YoutubeDL)
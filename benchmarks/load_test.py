@@ -0,0 +1,230 @@
+"""
+Load test of the bot's real handlers against local fakes
+
+Telegram, PyTgCalls and YouTube are replaced by benchmarks/fakes.py, so
+this runs offline. Every simulated chat queues a few songs with /play,
+skips some, optionally searches, and lets the rest of its queue play out
+through StreamEnded updates.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --chats 2000 --json results.json
+
+Bot settings (YTDL_SEARCH_WORKERS, CHAT_COALESCE_WINDOW, ...) can be
+overridden through the environment as usual.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import logging
+import resource
+import tempfile
+import tracemalloc
+from benchmarks import fakes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test of the music bot")
+    parser.add_argument("--chats", type=int, default=1000, help="simulated group chats")
+    parser.add_argument("--songs", type=int, default=3, help="/play commands per chat")
+    parser.add_argument("--skips", type=int, default=1, help="/skip commands per chat")
+    parser.add_argument("--search-ratio", type=float, default=0.2, help="share of chats that also /search")
+    parser.add_argument("--catalog", type=int, default=500, help="distinct songs requested, popular ones more often")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which chats start")
+    parser.add_argument("--assistants", type=int, default=4, help="assistant accounts")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per yt-dlp search")
+    parser.add_argument("--metadata-latency", type=float, default=0.05, help="seconds per metadata lookup")
+    parser.add_argument("--download-latency", type=float, default=0.2, help="seconds per download")
+    parser.add_argument("--join-latency", type=float, default=0.05, help="seconds to join a voice chat")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds per sent or edited message")
+    parser.add_argument("--song-length", type=float, default=1.0, help="seconds each song plays")
+    parser.add_argument("--audio-kb", type=int, default=64, help="size of each downloaded file")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's INFO and warning logs")
+    return parser.parse_args()
+
+def configure(args, workdir):
+    """Point the bot at fake credentials and a scratch directory, before config is imported"""
+    os.environ.update({
+        'API_ID': "1",
+        'API_HASH': "benchmark",
+        'BOT_TOKEN': "benchmark",
+        'SESSION_STRINGS': " ".join(f"assistant{i}" for i in range(args.assistants)),
+        'WORKER_PROCESSES': "1",
+        'TEMP_DOWNLOAD_DIRECTORY': os.path.join(workdir, "downloads", ""),
+        'QUEUE_DB_PATH': os.path.join(workdir, "queues.db"),
+        'CACHE_DB_PATH': "",
+    })
+    os.environ.pop('WORKER_INDEX', None)
+    # No ffmpeg in the loop: keep the downloaded container and skip loudness analysis
+    os.environ.setdefault('AUDIO_CACHE_FORMAT', "native")
+    os.environ.setdefault('LOUDNESS_NORMALIZATION', "false")
+
+    fakes.Latency.search = args.search_latency
+    fakes.Latency.metadata = args.metadata_latency
+    fakes.Latency.download = args.download_latency
+    fakes.Latency.join = args.join_latency
+    fakes.Latency.send = args.send_latency
+    fakes.Latency.song_length = args.song_length
+    fakes.Latency.audio_bytes = args.audio_kb * 1024
+    fakes.install()
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, 0 for no values"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize(values):
+    """p50/p99/max in milliseconds"""
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+        'max_ms': round(max(values, default=0.0) * 1000, 2),
+    }
+
+class LoadTest:
+    def __init__(self, args, bot_module):
+        self.args = args
+        self.bot = bot_module
+        self.rng = random.Random(args.seed)
+        # Zipf-like popularity, so repeated songs exercise the caches
+        self.weights = [1 / (rank + 1) for rank in range(args.catalog)]
+        self.latencies = {}
+        self.lag_samples = []
+        self.commands = 0
+
+    async def command(self, name, handler, chat_id, text):
+        """Run a handler on a fake message and record how long it took"""
+        message = fakes.Message(chat_id, text, user_id=chat_id)
+        started = time.perf_counter()
+        await handler(self.bot.bot, message)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        self.commands += 1
+
+    async def run_chat(self, chat_id):
+        """One group chat: queue songs, skip, search, then let the queue play out"""
+        await asyncio.sleep(self.rng.uniform(0, self.args.ramp))
+        for _ in range(self.args.songs):
+            song = self.rng.choices(range(self.args.catalog), self.weights)[0]
+            await self.command("play", self.bot.play_command, chat_id, f"/play fixture song {song}")
+
+        if self.rng.random() < self.args.search_ratio:
+            song = self.rng.randrange(self.args.catalog)
+            await self.command("search", self.bot.search_command, chat_id, f"/search fixture song {song}")
+
+        for _ in range(self.args.skips):
+            await asyncio.sleep(self.args.song_length * self.rng.uniform(0.2, 0.8))
+            await self.command("skip", self.bot.skip_command, chat_id, "/skip")
+
+        # The remaining songs end on their own through StreamEnded
+        while not self.bot.queue_manager.is_empty(chat_id):
+            await asyncio.sleep(max(0.1, self.args.song_length / 4))
+
+    async def sample_lag(self, interval=0.05):
+        """Record how late the loop wakes up, for the whole run"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag_samples.append(max(0.0, time.perf_counter() - started - interval))
+
+    async def run(self):
+        bot = self.bot
+
+        # Same startup as main.run_bot in a single process
+        await bot.bot.start()
+        await bot.assistants.start()
+        await bot.start_pytgcalls()
+        await bot.ytdl_executor.run('search', bot.ytdl_pool.warm)
+        await bot.recover_queues()
+        bot.watchdog.start()
+
+        lag_task = asyncio.ensure_future(self.sample_lag())
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_chat(-1000000 - i) for i in range(self.args.chats)))
+        elapsed = time.perf_counter() - started
+        lag_task.cancel()
+
+        bot.watchdog.stop()
+        if bot.queue_manager.store is not None:
+            bot.queue_manager.store.close()
+        return elapsed
+
+    def report(self, elapsed):
+        bot = self.bot
+        watchdog_stats = bot.watchdog.stats()
+        return {
+            'chats': self.args.chats,
+            'elapsed_s': round(elapsed, 2),
+            'commands': self.commands,
+            'commands_per_s': round(self.commands / elapsed, 1),
+            'songs_started': fakes.counters['songs_started'],
+            'songs_per_s': round(fakes.counters['songs_started'] / elapsed, 1),
+            'downloads': fakes.counters['downloads'],
+            'messages': fakes.counters['messages'] + fakes.counters['edits'],
+            'latency': {name: summarize(values) for name, values in self.latencies.items()},
+            'loop_lag': summarize(self.lag_samples),
+            'loop_stalls': watchdog_stats['stalls'],
+            'slow_handlers': watchdog_stats['slow_handlers'],
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'cache_hit_ratio': {
+                'search': bot.search_cache.stats()['hit_ratio'],
+                'metadata': bot.metadata_cache.stats()['hit_ratio'],
+                'audio': bot.audio_cache.stats()['hit_ratio'],
+            },
+        }
+
+def print_report(results):
+    print(f"\n{results['chats']} chats in {results['elapsed_s']}s")
+    print(f"  commands: {results['commands']} ({results['commands_per_s']}/s)")
+    print(f"  songs started: {results['songs_started']} ({results['songs_per_s']}/s), "
+          f"downloads: {results['downloads']}, messages: {results['messages']}")
+    print("  latency:")
+    for name, stats in sorted(results['latency'].items()):
+        print(f"    {name:<8} n={stats['count']:<6} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+    lag = results['loop_lag']
+    print(f"  loop lag: p50={lag['p50_ms']}ms p99={lag['p99_ms']}ms max={lag['max_ms']}ms, "
+          f"stalls: {results['loop_stalls']}, slow handlers: {results['slow_handlers']}")
+    print(f"  cache hit ratio: {results['cache_hit_ratio']}")
+    memory = f"  max RSS: {results['max_rss_mb']} MB"
+    if 'tracemalloc_peak_mb' in results:
+        memory += f", Python heap peak: {results['tracemalloc_peak_mb']} MB"
+    print(memory)
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        # Watchdog warnings are counted in the report instead
+        logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="musicbot-bench-")
+    try:
+        configure(args, workdir)
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        # Imported only now, so it picks up the fakes and the scratch configuration
+        import bot
+
+        test = LoadTest(args, bot)
+        elapsed = asyncio.run(test.run())
+        results = test.report(elapsed)
+        if args.tracemalloc:
+            results['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+
+        print_report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
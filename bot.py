@@ -1,9 +1,10 @@
 import os
+import heapq
 import asyncio
 import logging
+import functools
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from pytgcalls import PyTgCalls
 from pytgcalls.types import StreamEnded
 
 # Import custom exceptions
@@ -11,35 +12,129 @@ class NoActiveGroupCall(Exception):
     pass
 
 from config import Config
-from helpers.youtube import search_youtube, get_youtube_stream
-from helpers.queue_manager import QueueManager
+from helpers.youtube import search_youtube, get_video_info, get_stream_source, search_cache, metadata_cache
+from helpers.queue_manager import QueueManager, Track
+from helpers.prefetch import Prefetcher
+from helpers.persistence import QueueStore
+from helpers.chat_actor import ChatActor
+from helpers.retry import failure_scheduler
 from helpers.stream_helper import leave_call, change_stream, start_stream
+from helpers.assistants import AssistantPool
+from helpers.workers import WorkerSupervisor, owner_of
+from helpers.executor import ytdl_executor
+from helpers.ytdl_pool import ytdl_pool
+from helpers.metrics import registry, instrumented
+from helpers.watchdog import watchdog
+from helpers.tracing import tracer, traced
+from helpers.outbox import Outbox
+from helpers.audio_cache import audio_cache
+from helpers.transcoder import transcoder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Set when this process is one of several worker processes
+is_worker = Config.WORKER_INDEX >= 0
+
 # Initialize clients
 bot = Client(
-    "MusicBot",
+    f"MusicBot{Config.WORKER_INDEX}" if is_worker else "MusicBot",
     api_id=Config.API_ID,
     api_hash=Config.API_HASH,
-    bot_token=Config.BOT_TOKEN
+    bot_token=Config.BOT_TOKEN,
+    # Workers only send messages, updates arrive at the coordinating process
+    in_memory=is_worker or None,
+    no_updates=is_worker or None
 )
 
-# User client (needed to join voice chat)
-user = Client(
-    "UserBot",
-    api_id=Config.API_ID,
-    api_hash=Config.API_HASH,
-    session_string=Config.SESSION_STRING
+# Assistant user clients (needed to join voice chat), each with its own PyTgCalls;
+# a worker process only gets its share of the session strings
+assistants = AssistantPool(
+    Config.SESSION_STRINGS[Config.WORKER_INDEX::Config.WORKER_PROCESSES] if is_worker else Config.SESSION_STRINGS,
+    Config.ASSISTANT_PLACEMENT
 )
 
-# Initialize PyTgCalls client
-call_py = PyTgCalls(user)
+# Worker processes, only set in the coordinating process when WORKER_PROCESSES > 1
+supervisor = None
+
+# Handlers that touch a chat's playback, run by the worker owning the chat
+ROUTED_HANDLERS = {}
+
+def routed(func):
+    """Forward a handler to the worker owning the chat when running with worker processes"""
+    ROUTED_HANDLERS[func.__name__] = func
+    
+    @functools.wraps(func)
+    async def wrapper(client, message):
+        if supervisor is not None:
+            supervisor.route(func.__name__, message)
+            return
+        await func(client, message)
+    return wrapper
+
+# Queue manager for each chat, saved to disk so queues survive restarts
+queue_manager = QueueManager(
+    QueueStore(Config.QUEUE_DB_PATH, Config.QUEUE_FLUSH_INTERVAL) if Config.QUEUE_DB_PATH else None
+)
+
+# Background downloads of the songs queued after the current one
+prefetcher = Prefetcher()
+
+def prefetch_upcoming(chat_id):
+    """Start downloading the next songs in a chat's queue"""
+    prefetcher.schedule(queue_manager.get_upcoming(chat_id, prefetcher.depth))
+
+# Serializes play/skip/stop/stream-end transitions per chat
+chat_actor = ChatActor()
+
+# Gauges read from the live objects, only when /metrics is scraped
+def _cache_hit_ratios():
+    caches = {'search': search_cache, 'metadata': metadata_cache, 'audio': audio_cache}
+    return [((name,), cache.stats()['hit_ratio']) for name, cache in caches.items()]
 
-# Queue manager for each chat
-queue_manager = QueueManager()
+def _ytdl_jobs():
+    return [
+        ((pool, state), stats[state])
+        for pool, stats in ytdl_executor.stats().items()
+        for state in ('queued', 'running')
+    ]
+
+registry.gauge(
+    "musicbot_cache_hit_ratio", "Hit ratio of the search, metadata and audio caches", ("cache",),
+    _cache_hit_ratios
+)
+registry.gauge(
+    "musicbot_queue_length", "Songs queued per chat, including the current one", ("chat_id",),
+    lambda: [((chat_id,), len(queue)) for chat_id, queue in list(queue_manager.queues.items())]
+)
+registry.gauge(
+    "musicbot_active_voice_chats", "Voice chats served by each assistant", ("assistant",),
+    lambda: [((index,), chats) for index, chats in assistants.stats().items()]
+)
+registry.gauge(
+    "musicbot_ytdl_jobs", "yt-dlp jobs per pool and state", ("pool", "state"),
+    _ytdl_jobs
+)
+registry.gauge(
+    "musicbot_outbox_queued", "Messages and edits waiting in the outbox",
+    callback=lambda: [((), outbox.stats()['queued'])]
+)
+registry.gauge(
+    "musicbot_transcode_queued", "ffmpeg jobs waiting for a transcoder slot",
+    callback=lambda: [((), transcoder.stats()['queued'])]
+)
+
+# Rate-limited sending, replies and edits go out without blocking the handlers
+outbox = Outbox(bot)
+
+# Helper function to notify a chat about playback changes
+def notify(chat_id, message, text, key=None):
+    """Reply to a message, or post to the chat when there is none, without waiting"""
+    if message is not None:
+        outbox.reply(message, text, key=key)
+    else:
+        outbox.post(chat_id, text, key=key)
 
 # Helper function to create a basic info panel
 def create_info_panel():
@@ -53,6 +148,7 @@ def create_info_panel():
 
 # Start command
 @bot.on_message(filters.command("start") & filters.private)
+@instrumented
 async def start_command(_, message: Message):
     await message.reply_text(
         "👋 **Hello! I'm a Telegram Music Bot**\n\n"
@@ -63,6 +159,7 @@ async def start_command(_, message: Message):
 
 # Help command
 @bot.on_message(filters.command("help"))
+@instrumented
 async def help_command(_, message: Message):
     help_text = (
         "🎵 **Available Commands:**\n\n"
@@ -71,6 +168,9 @@ async def help_command(_, message: Message):
         "• `/skip` - Skip to the next song\n"
         "• `/stop` - Stop playing and clear queue\n"
         "• `/queue` - Show current queue\n"
+        "• `/shuffle` - Shuffle the upcoming songs\n"
+        "• `/remove` - Remove a song from the queue\n"
+        "• `/move` - Move a song to another queue position\n"
         "• `/pause` - Pause the current song\n"
         "• `/resume` - Resume the paused song\n"
         "• `/ping` - Check bot's response time\n\n"
@@ -80,6 +180,7 @@ async def help_command(_, message: Message):
 
 # Ping command
 @bot.on_message(filters.command("ping"))
+@instrumented
 async def ping_command(_, message: Message):
     start_time = asyncio.get_event_loop().time()
     m = await message.reply_text("🏓 Pinging...")
@@ -90,150 +191,275 @@ async def ping_command(_, message: Message):
 
 # Play command
 @bot.on_message(filters.command("play"))
+@routed
+@instrumented
+@traced(root=True)
 async def play_command(_, message: Message):
     chat_id = message.chat.id
     
     # Check if there's any text after the command
     if len(message.command) < 2:
-        await message.reply_text("❌ Please provide a song name or YouTube URL after the command.")
+        outbox.reply(message, "❌ Please provide a song name or YouTube URL after the command.")
         return
     
     query = " ".join(message.command[1:])
-    m = await message.reply_text(f"🔍 Searching for: **{query}**")
+    tracer.annotate(chat_id=chat_id, query=query)
+    with tracer.span("reply"):
+        m = await outbox.send(chat_id, f"🔍 Searching for: **{query}**", reply_to_message_id=message.id)
     
     try:
-        # Search for the song
-        results = await search_youtube(query)
+        # Search for the song, only the first hit is needed
+        results = await search_youtube(query, limit=1)
         if not results:
-            await m.edit("❌ No results found. Try a different search term.")
+            outbox.edit(m, "❌ No results found. Try a different search term.")
             return
         
-        # Get the first result
+        # Get the first result, with full metadata only if the search entry lacks it
         result = results[0]
+        if result['duration'] == "Unknown":
+            result = await get_video_info(result['id']) or result
         title = result['title']
         duration = result['duration']
         thumbnail = result['thumbnail']
         video_id = result['id']
         url = f"https://www.youtube.com/watch?v={video_id}"
         
-        # Add to queue
-        position = queue_manager.add_to_queue(chat_id, {
-            'title': title,
-            'url': url,
-            'requested_by': message.from_user.mention() if message.from_user else "Anonymous"
-        })
+        # Add to queue, in order with the chat's other transitions
+        track = Track(
+            title,
+            url,
+            message.from_user.mention() if message.from_user else "Anonymous",
+            duration
+        )
+        position = await chat_actor.submit(chat_id, enqueue_track, chat_id, track, m)
         
-        # If it's the first song in queue, start playing
-        if position == 1:
-            await m.edit(f"🎵 **Starting to play:**\n**{title}**\n\n⏱ Duration: `{duration}`")
-            await start_streaming(chat_id, url, m)
-        else:
-            await m.edit(f"🎵 **Added to queue at position #{position}:**\n**{title}**\n\n⏱ Duration: `{duration}`")
+        if position > 1:
+            outbox.edit(m, f"🎵 **Added to queue at position #{position}:**\n**{title}**\n\n⏱ Duration: `{duration}`")
     
     except Exception as e:
         logger.error(f"Error playing song: {e}")
-        await m.edit(f"❌ Error: {str(e)}")
+        outbox.edit(m, f"❌ Error: {str(e)}")
+
+# Add a song to the queue and start playing if it's the first one
+async def enqueue_track(chat_id, track, m):
+    position = queue_manager.add_to_queue(chat_id, track)
+    
+    if position == 1:
+        outbox.edit(m, f"🎵 **Starting to play:**\n**{track.title}**\n\n⏱ Duration: `{track.duration}`")
+        await start_streaming(chat_id, track.url, m)
+    else:
+        prefetch_upcoming(chat_id)
+    return position
 
 # Queue command
 @bot.on_message(filters.command("queue"))
+@routed
+@instrumented
 async def queue_command(_, message: Message):
     chat_id = message.chat.id
     queue = queue_manager.get_queue(chat_id)
     
     if not queue:
-        await message.reply_text("🔈 The queue is empty.")
+        outbox.reply(message, "🔈 The queue is empty.")
         return
     
     queue_text = "🎵 **Current Queue:**\n\n"
     for i, song in enumerate(queue, 1):
-        queue_text += f"**{i}.** {song['title']} | Requested by: {song['requested_by']}\n"
+        queue_text += f"**{i}.** {song.title} | Requested by: {song.requested_by}\n"
     
-    await message.reply_text(queue_text)
+    outbox.reply(message, queue_text)
+
+# Shuffle command
+@bot.on_message(filters.command("shuffle"))
+@routed
+@instrumented
+async def shuffle_command(_, message: Message):
+    chat_id = message.chat.id
+    
+    if len(queue_manager.get_queue(chat_id)) < 3:
+        outbox.reply(message, "❌ Not enough songs in queue to shuffle.")
+        return
+    
+    queue_manager.shuffle(chat_id)
+    prefetch_upcoming(chat_id)
+    outbox.reply(message, "🔀 Shuffled the queue.")
+
+# Remove command
+@bot.on_message(filters.command("remove"))
+@routed
+@instrumented
+async def remove_command(_, message: Message):
+    chat_id = message.chat.id
+    
+    if len(message.command) < 2 or not message.command[1].isdigit():
+        outbox.reply(message, "❌ Please provide the queue position to remove, e.g. `/remove 3`")
+        return
+    
+    try:
+        track = queue_manager.remove(chat_id, int(message.command[1]))
+    except ValueError as e:
+        outbox.reply(message, f"❌ {str(e)}")
+        return
+    
+    prefetch_upcoming(chat_id)
+    outbox.reply(message, f"🗑 Removed **{track.title}** from the queue.")
+
+# Move command
+@bot.on_message(filters.command("move"))
+@routed
+@instrumented
+async def move_command(_, message: Message):
+    chat_id = message.chat.id
+    
+    if len(message.command) < 3 or not all(arg.isdigit() for arg in message.command[1:3]):
+        outbox.reply(message, "❌ Please provide two queue positions, e.g. `/move 5 2`")
+        return
+    
+    try:
+        track = queue_manager.move(chat_id, int(message.command[1]), int(message.command[2]))
+    except ValueError as e:
+        outbox.reply(message, f"❌ {str(e)}")
+        return
+    
+    prefetch_upcoming(chat_id)
+    outbox.reply(message, f"↕️ Moved **{track.title}** to position #{message.command[2]}.")
 
 # Skip command
 @bot.on_message(filters.command("skip"))
+@routed
+@instrumented
 async def skip_command(_, message: Message):
     chat_id = message.chat.id
     
-    if not queue_manager.get_queue(chat_id):
-        await message.reply_text("❌ No songs in queue to skip.")
+    current = queue_manager.get_current_song(chat_id)
+    if current is None:
+        outbox.reply(message, "❌ No songs in queue to skip.")
         return
     
-    await message.reply_text("⏭ Skipping to the next song...")
+    outbox.reply(message, "⏭ Skipping to the next song...")
     
-    # Remove current song and play next one
-    queue_manager.skip(chat_id)
-    queue = queue_manager.get_queue(chat_id)
+    # A burst of skips and stream ends for the same song becomes one transition
+    await chat_actor.submit(chat_id, advance_queue, chat_id, current, message, coalesce="advance")
+
+# Move past the current song and play the next one
+@traced(root=True)
+async def advance_queue(requests):
+    """
+    Handle a burst of /skip and stream-end events for a chat
+    
+    Args:
+        requests: List of (chat_id, track, message) tuples, where track is
+            the song that was playing when the event came in and message is
+            None for stream ends
+    """
+    chat_id = requests[0][0]
+    targets = [track for _, track, _ in requests]
+    tracer.annotate(chat_id=chat_id, events=len(requests))
     
-    if queue:
-        next_song = queue[0]
-        await start_streaming(chat_id, next_song['url'], message)
+    # Reply to the last user who skipped, or post to the chat for stream ends
+    message = next((m for _, _, m in reversed(requests) if m is not None), None)
+    
+    # Skip each targeted song once; it may already be gone after a /stop
+    skipped = False
+    while any(queue_manager.get_current_song(chat_id) is track for track in targets):
+        queue_manager.skip(chat_id)
+        skipped = True
+    if not skipped:
+        return
+    
+    next_song = queue_manager.get_current_song(chat_id)
+    if next_song:
+        await start_streaming(chat_id, next_song.url, message, change=True)
+        notify(
+            chat_id,
+            message,
+            f"🎵 **Now playing:** {next_song.title}\n**Requested by:** {next_song.requested_by}",
+            key="now_playing"
+        )
     else:
+        # Leave the voice chat if queue is empty
         try:
-            await call_py.leave_group_call(chat_id)
-            await message.reply_text("🔈 Queue is empty, leaving voice chat.")
+            await leave_call(assistants, chat_id)
         except Exception as e:
             logger.error(f"Error leaving call: {e}")
+        notify(chat_id, message, "🔈 Queue is empty, leaving voice chat.", key="now_playing")
 
 # Stop command
 @bot.on_message(filters.command("stop"))
+@routed
+@instrumented
 async def stop_command(_, message: Message):
+    await chat_actor.submit(message.chat.id, stop_playback, message)
+
+# Clear the queue and leave the voice chat
+async def stop_playback(message):
     chat_id = message.chat.id
     
     # Clear the queue
     queue_manager.clear_queue(chat_id)
     
     try:
-        await call_py.leave_group_call(chat_id)
-        await message.reply_text("⏹ Stopped playing and cleared queue.")
+        await leave_call(assistants, chat_id)
+        outbox.reply(message, "⏹ Stopped playing and cleared queue.")
     except NoActiveGroupCall:
-        await message.reply_text("⏹ No active voice chat to stop.")
+        outbox.reply(message, "⏹ No active voice chat to stop.")
     except Exception as e:
         logger.error(f"Error stopping playback: {e}")
-        await message.reply_text(f"❌ Error: {str(e)}")
+        outbox.reply(message, f"❌ Error: {str(e)}")
 
 # Pause command
 @bot.on_message(filters.command("pause"))
+@routed
+@instrumented
 async def pause_command(_, message: Message):
     chat_id = message.chat.id
     
     try:
+        call_py = assistants.serving(chat_id)
+        if call_py is None:
+            raise NoActiveGroupCall()
         await call_py.pause_stream(chat_id)
-        await message.reply_text("⏸ Paused playback.")
+        outbox.reply(message, "⏸ Paused playback.")
     except NoActiveGroupCall:
-        await message.reply_text("❌ Not currently playing anything.")
+        outbox.reply(message, "❌ Not currently playing anything.")
     except Exception as e:
         logger.error(f"Error pausing: {e}")
-        await message.reply_text(f"❌ Error: {str(e)}")
+        outbox.reply(message, f"❌ Error: {str(e)}")
 
 # Resume command
 @bot.on_message(filters.command("resume"))
+@routed
+@instrumented
 async def resume_command(_, message: Message):
     chat_id = message.chat.id
     
     try:
+        call_py = assistants.serving(chat_id)
+        if call_py is None:
+            raise NoActiveGroupCall()
         await call_py.resume_stream(chat_id)
-        await message.reply_text("▶️ Resumed playback.")
+        outbox.reply(message, "▶️ Resumed playback.")
     except NoActiveGroupCall:
-        await message.reply_text("❌ Nothing to resume.")
+        outbox.reply(message, "❌ Nothing to resume.")
     except Exception as e:
         logger.error(f"Error resuming: {e}")
-        await message.reply_text(f"❌ Error: {str(e)}")
+        outbox.reply(message, f"❌ Error: {str(e)}")
 
 # Search command
 @bot.on_message(filters.command("search"))
+@instrumented
 async def search_command(_, message: Message):
     if len(message.command) < 2:
-        await message.reply_text("❌ Please provide a search term after the command.")
+        outbox.reply(message, "❌ Please provide a search term after the command.")
         return
     
     query = " ".join(message.command[1:])
-    m = await message.reply_text(f"🔍 Searching for: **{query}**")
+    m = await outbox.send(message.chat.id, f"🔍 Searching for: **{query}**", reply_to_message_id=message.id)
     
     try:
         results = await search_youtube(query)
         if not results:
-            await m.edit("❌ No results found. Try a different search term.")
+            outbox.edit(m, "❌ No results found. Try a different search term.")
             return
         
         text = "🎵 **Search Results:**\n\n"
@@ -244,69 +470,194 @@ async def search_command(_, message: Message):
             text += f"**{i}.** {title} | `{duration}`\n" \
                     f"   `/play https://www.youtube.com/watch?v={video_id}`\n\n"
         
-        await m.edit(text)
+        outbox.edit(m, text)
     
     except Exception as e:
         logger.error(f"Error searching: {e}")
-        await m.edit(f"❌ Error: {str(e)}")
+        outbox.edit(m, f"❌ Error: {str(e)}")
 
 # Function to start streaming
-async def start_streaming(chat_id, url, message):
-    try:
+@traced()
+async def start_streaming(chat_id, url, message, change=False):
+    failures = 0
+    while True:
+        try:
+            # Transient errors are retried with backoff, permanent ones fail at once
+            await failure_scheduler.run(lambda: play_source(chat_id, url, change))
+            prefetch_upcoming(chat_id)
+            return
+        except Exception as e:
+            logger.error(f"Error in start_streaming: {e}")
+            notify(chat_id, message, f"❌ Error starting stream: {str(e)}")
+            
+            # Without a voice chat every other song would fail the same way
+            if failure_scheduler.classify(e) == 'no_call':
+                await give_up(chat_id, change)
+                return
+        
+        # Remove the song from queue and try the next one, backing off a bit more each time
+        failures += 1
+        queue_manager.skip(chat_id)
+        next_song = queue_manager.get_current_song(chat_id)
+        if next_song is None:
+            return
+        if failures >= Config.MAX_CONSECUTIVE_FAILURES:
+            notify(chat_id, message, f"⚠️ {failures} songs in a row failed, stopping and clearing the queue.")
+            await give_up(chat_id, change)
+            return
+        
+        notify(chat_id, message, f"⏭ Skipping to next song due to error: **{next_song.title}**")
+        await asyncio.sleep(failure_scheduler.skip_delay(failures))
+        url = next_song.url
+
+# Stop playback after a failure, so the next /play starts a fresh queue
+async def give_up(chat_id, change):
+    queue_manager.clear_queue(chat_id)
+    if change:
+        # Still in the call from the previous song
+        try:
+            await leave_call(assistants, chat_id)
+        except Exception as e:
+            logger.error(f"Error leaving call: {e}")
+
+async def play_source(chat_id, url, change):
+    if change:
+        # Already in the call, switch to the new song
+        await change_stream(assistants, chat_id, url)
+    else:
         # Get the audio stream from YouTube
-        file_path = await get_youtube_stream(url)
+        file_path = await get_stream_source(url)
         
         # Start the stream
-        await start_stream(call_py, chat_id, file_path)
-    except Exception as e:
-        logger.error(f"Error in start_streaming: {e}")
-        await message.reply(f"❌ Error starting stream: {str(e)}")
-        # Remove the song from queue and try the next one
-        queue_manager.skip(chat_id)
-        queue = queue_manager.get_queue(chat_id)
-        if queue:
-            next_song = queue[0]
-            await message.reply_text(f"⏭ Skipping to next song due to error: **{next_song['title']}**")
-            await start_streaming(chat_id, next_song['url'], message)
+        await start_stream(assistants, chat_id, file_path)
 
 # Handle stream end
-@call_py.on_update()
+@assistants.on_update()
+@instrumented
 async def stream_end_handler(_, update):
     if isinstance(update, StreamEnded):
         chat_id = update.chat_id
         
-        # Remove the current song from the queue
-        queue_manager.skip(chat_id)
-        queue = queue_manager.get_queue(chat_id)
-        
-        if queue:
-            # Play the next song
-            next_song = queue[0]
-            await change_stream(call_py, chat_id, next_song['url'])
-            
-            # Send notification to the chat
-            try:
-                await bot.send_message(
-                    chat_id=chat_id,
-                    text=f"🎵 **Now playing:** {next_song['title']}\n**Requested by:** {next_song['requested_by']}"
-                )
-            except Exception as e:
-                logger.error(f"Error sending notification: {e}")
-        else:
-            # Leave the voice chat if queue is empty
-            await leave_call(call_py, chat_id)
-            try:
-                await bot.send_message(chat_id=chat_id, text="🔈 Queue is empty, leaving voice chat.")
-            except Exception as e:
-                logger.error(f"Error sending notification: {e}")
+        # Move past the song that just ended, unless a /skip already did
+        current = queue_manager.get_current_song(chat_id)
+        if current is None:
+            return
+        await chat_actor.submit(chat_id, advance_queue, chat_id, current, None, coalesce="advance")
+
+# Restore saved queues and start rejoining their voice chats in the background
+async def recover_queues():
+    if is_worker:
+        # The queue database is shared, only take the chats this worker owns
+        chat_ids = queue_manager.restore(
+            lambda chat_id: owner_of(chat_id, Config.WORKER_PROCESSES) == Config.WORKER_INDEX
+        )
+    else:
+        chat_ids = queue_manager.restore()
+    logger.info(f"Restored {len(chat_ids)} queues")
+    
+    # Rejoin all chats in parallel, each one starts from its current song; startup
+    # doesn't wait for them, as that includes every download and retry
+    for chat_id in chat_ids:
+        asyncio.ensure_future(resume_chat(chat_id))
+
+async def resume_chat(chat_id):
+    current = queue_manager.get_current_song(chat_id)
+    try:
+        message = await outbox.send(chat_id, f"♻️ **Resuming after a restart:** {current.title}")
+    except Exception as e:
+        # The bot can no longer post there, so the queue is stale
+        logger.error(f"Error resuming chat {chat_id}: {e}")
+        queue_manager.clear_queue(chat_id)
+        return
+    
+    await chat_actor.submit(chat_id, start_streaming, chat_id, current.url, message)
 
 # Start PyTgCalls client
 async def start_pytgcalls():
-    await call_py.start()
-    print("PyTgCalls client started!")
+    await assistants.start_calls()
+    print(f"PyTgCalls clients started for {len(assistants)} assistants!")
+
+# Start worker processes and route playback commands to them
+def start_workers():
+    global supervisor
+    supervisor = WorkerSupervisor()
+    supervisor.start()
+
+def stop_workers():
+    global supervisor
+    if supervisor is not None:
+        supervisor.stop()
+        supervisor = None
+
+# Chats listed on the web dashboard, busiest first
+DASHBOARD_CHATS = 50
+
+# Live state shown on the web dashboard
+def dashboard_state():
+    queues = heapq.nlargest(DASHBOARD_CHATS, queue_manager.queues.items(), key=lambda item: len(item[1]))
+    transcode_stats = transcoder.stats()
+    transcode_stats.pop('recent', None)
+    return {
+        'active_calls': len(assistants.assignments),
+        'queued_chats': len(queue_manager.queues),
+        'chats': [
+            {
+                'chat_id': chat_id,
+                'now_playing': queue[0].title,
+                'requested_by': queue[0].requested_by,
+                'queued': len(queue) - 1,
+            }
+            for chat_id, queue in queues
+        ],
+        'assistants': assistants.stats(),
+        'caches': {
+            'search': search_cache.stats(),
+            'metadata': metadata_cache.stats(),
+            'audio': audio_cache.stats(),
+        },
+        'ytdl': ytdl_executor.stats(),
+        'transcoder': transcode_stats,
+        'outbox': outbox.stats(),
+        'workers': supervisor.stats() if supervisor is not None else None,
+        'watchdog': {key: value for key, value in watchdog.stats().items() if key != 'recent'},
+    }
+
+# Main loop of a worker process
+async def run_worker(commands):
+    await bot.start()
+    await assistants.start()
+    await start_pytgcalls()
+    await ytdl_executor.run('search', ytdl_pool.warm)
+    await recover_queues()
+    logger.info(f"Worker {Config.WORKER_INDEX} ready with {len(assistants)} assistants")
+    watchdog.start()
+    
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command is None:
+                break
+            asyncio.ensure_future(run_routed(*command))
+    finally:
+        watchdog.stop()
+        await bot.stop()
+        await assistants.stop()
+        if queue_manager.store is not None:
+            queue_manager.store.close()
+
+async def run_routed(handler_name, chat_id, message_id, command):
+    try:
+        # Fetch the message through this worker's own bot client so replies work
+        message = await bot.get_messages(chat_id, message_id)
+        message.command = command
+        await ROUTED_HANDLERS[handler_name](bot, message)
+    except Exception as e:
+        logger.error(f"Error running {handler_name} for chat {chat_id}: {e}")
 
 # Register callback query handler for buttons
 @bot.on_callback_query()
+@instrumented
 async def callback_handler(_, query):
     data = query.data
     
@@ -318,6 +669,9 @@ async def callback_handler(_, query):
             "• `/skip` - Skip to the next song\n"
             "• `/stop` - Stop playing and clear queue\n"
             "• `/queue` - Show current queue\n"
+            "• `/shuffle` - Shuffle the upcoming songs\n"
+            "• `/remove` - Remove a song from the queue\n"
+            "• `/move` - Move a song to another queue position\n"
             "• `/pause` - Pause the current song\n"
             "• `/resume` - Resume the paused song\n"
             "• `/ping` - Check bot's response time\n\n"
@@ -18,6 +18,19 @@ class Config:
     # This is needed because bots can't join voice chats
     SESSION_STRING = os.getenv("SESSION_STRING", "")
     
+    # Several assistant accounts (space separated) to spread voice chats over,
+    # falls back to SESSION_STRING alone
+    SESSION_STRINGS = os.getenv("SESSION_STRINGS", "").split() or [SESSION_STRING]
+    
+    # Worker processes sharing the chats (1 = everything runs in one process)
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+    
+    # Index of this worker, set by the supervisor for its worker processes
+    WORKER_INDEX = int(os.getenv("WORKER_INDEX", "-1"))
+    
+    # How chats are assigned to assistants: 'hash' (consistent hashing) or 'least_loaded'
+    ASSISTANT_PLACEMENT = os.getenv("ASSISTANT_PLACEMENT", "hash").lower()
+    
     # Prefixes for commands (optional)
     COMMAND_PREFIXES = list(os.getenv("COMMAND_PREFIXES", "! / .").split())
     
@@ -27,12 +40,103 @@ class Config:
     # Maximum number of songs in queue
     MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "10"))
     
+    # Seconds to wait for a burst of /skip and stream-end events before acting on it once
+    CHAT_COALESCE_WINDOW = float(os.getenv("CHAT_COALESCE_WINDOW", "0.3"))
+    
+    # Songs in a row allowed to fail before playback gives up on a queue
+    MAX_CONSECUTIVE_FAILURES = int(os.getenv("MAX_CONSECUTIVE_FAILURES", "3"))
+    
+    # Base delay (in seconds) before trying the next song after a failure
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+    
+    # Seconds a video that failed permanently (unavailable, private, ...) is not retried
+    FAILED_VIDEO_TTL = int(os.getenv("FAILED_VIDEO_TTL", "3600"))
+    
+    # SQLite file keeping queues across restarts (empty to keep them in memory only)
+    QUEUE_DB_PATH = os.getenv("QUEUE_DB_PATH", "queues.db")
+    
+    # Seconds between batched queue writes
+    QUEUE_FLUSH_INTERVAL = float(os.getenv("QUEUE_FLUSH_INTERVAL", "1"))
+    
     # Default language for song searches
     DEFAULT_LANG = os.getenv("DEFAULT_LANG", "en")
     
     # Temporary directory for audio files
     TEMP_DOWNLOAD_DIRECTORY = os.getenv("TEMP_DOWNLOAD_DIRECTORY", "./downloads/")
     
-    # Create temp directory if it doesn't exist
-    if not os.path.isdir(TEMP_DOWNLOAD_DIRECTORY):
-        os.makedirs(TEMP_DOWNLOAD_DIRECTORY)
+    # Disk budget (in MB) and eviction policy ('lru' or 'lfu') for cached audio
+    AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "2048"))
+    AUDIO_CACHE_POLICY = os.getenv("AUDIO_CACHE_POLICY", "lru").lower()
+    
+    # Cached audio format: 'mp3' re-encodes every download, 'native' keeps the original stream
+    AUDIO_CACHE_FORMAT = os.getenv("AUDIO_CACHE_FORMAT", "mp3").lower()
+    
+    # Analyze cached songs once and play them at a common loudness (target in LUFS)
+    LOUDNESS_NORMALIZATION = os.getenv("LOUDNESS_NORMALIZATION", "true").lower() == "true"
+    LOUDNESS_TARGET = float(os.getenv("LOUDNESS_TARGET", "-14"))
+    
+    # ffmpeg processes allowed to run at once for audio preparation
+    TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "2"))
+    
+    # How songs are played: 'download' caches a file first, 'direct' streams the media URL
+    STREAM_MODE = os.getenv("STREAM_MODE", "download").lower()
+    
+    # Seconds a resolved media URL is reused in direct mode
+    STREAM_URL_TTL = int(os.getenv("STREAM_URL_TTL", "1800"))
+    
+    # Upcoming songs to download ahead per chat, and the cap on concurrent prefetches
+    PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "1"))
+    PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+    
+    # Worker threads for yt-dlp searches/metadata and for downloads
+    YTDL_SEARCH_WORKERS = int(os.getenv("YTDL_SEARCH_WORKERS", "4"))
+    YTDL_DOWNLOAD_WORKERS = int(os.getenv("YTDL_DOWNLOAD_WORKERS", "2"))
+    
+    # Per-job timeouts (in seconds) for yt-dlp searches and downloads
+    YTDL_SEARCH_TIMEOUT = float(os.getenv("YTDL_SEARCH_TIMEOUT", "30"))
+    YTDL_DOWNLOAD_TIMEOUT = float(os.getenv("YTDL_DOWNLOAD_TIMEOUT", "300"))
+    
+    # Jobs a pooled YoutubeDL instance serves before it is replaced
+    YTDL_RECYCLE_AFTER = int(os.getenv("YTDL_RECYCLE_AFTER", "200"))
+    
+    # Search query and video metadata caches (TTL in seconds, size in entries)
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    METADATA_CACHE_TTL = int(os.getenv("METADATA_CACHE_TTL", "86400"))
+    METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "4096"))
+    
+    # Optional SQLite file backing the caches so a restart starts warm
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+    
+    # Outgoing messages per second across all chats, and per chat (with a short burst allowance)
+    OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))
+    OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+    OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+    
+    # Unix socket of the bot service's control API, used by the web workers
+    CONTROL_SOCKET = os.getenv("CONTROL_SOCKET", "/tmp/musicbot-control.sock")
+    CONTROL_TIMEOUT = float(os.getenv("CONTROL_TIMEOUT", "5"))
+    CONTROL_RETRY_DELAY = float(os.getenv("CONTROL_RETRY_DELAY", "2"))
+    
+    # Start the bot as soon as the service starts instead of waiting for the web page
+    BOT_AUTOSTART = os.getenv("BOT_AUTOSTART", "false").lower() == "true"
+    
+    # Seconds between live state pushes to web dashboard viewers
+    DASHBOARD_INTERVAL = float(os.getenv("DASHBOARD_INTERVAL", "2"))
+    
+    # Watchdog: event loop stalls over this many seconds are reported
+    WATCHDOG_THRESHOLD = float(os.getenv("WATCHDOG_THRESHOLD", "1"))
+    # Handlers still running after this many seconds are reported; most of that is spent
+    # waiting on searches and downloads, so it is well above a normal /play
+    WATCHDOG_HANDLER_THRESHOLD = float(os.getenv("WATCHDOG_HANDLER_THRESHOLD", "30"))
+    WATCHDOG_INTERVAL = float(os.getenv("WATCHDOG_INTERVAL", "0.25"))
+    
+    # Span tracing of /play: spans kept in memory and an optional JSON lines export file
+    TRACING = os.getenv("TRACING", "true").lower() == "true"
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "2048"))
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+    
+    # Each worker process keeps its own share of the audio cache
+    if WORKER_INDEX >= 0:
+        TEMP_DOWNLOAD_DIRECTORY = os.path.join(TEMP_DOWNLOAD_DIRECTORY, f"worker-{WORKER_INDEX}", "")
+        AUDIO_CACHE_MAX_MB //= WORKER_PROCESSES
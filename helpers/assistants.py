@@ -0,0 +1,121 @@
+import bisect
+import hashlib
+import logging
+from pyrogram import Client
+from pytgcalls import PyTgCalls
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Points per assistant on the hash ring, more points spread chats more evenly
+RING_REPLICAS = 64
+
+def _hash(key):
+    """Stable hash (unlike hash(), not salted per process)"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+class Assistant:
+    """A user account that joins voice chats, with its own PyTgCalls"""
+    __slots__ = ("index", "client", "call_py", "chats")
+
+    def __init__(self, index, session_string):
+        self.index = index
+        self.client = Client(
+            "UserBot" if index == 0 else f"UserBot{index}",
+            api_id=Config.API_ID,
+            api_hash=Config.API_HASH,
+            session_string=session_string
+        )
+        self.call_py = PyTgCalls(self.client)
+        # Chats this assistant is currently assigned to
+        self.chats = set()
+
+class AssistantPool:
+    """Assign voice chats to several assistant accounts"""
+
+    def __init__(self, session_strings, placement="hash"):
+        """
+        Initialize the pool
+
+        Args:
+            session_strings: Pyrogram session strings, one per assistant
+            placement: 'hash' (consistent hashing) or 'least_loaded'
+        """
+        if not session_strings:
+            raise ValueError("At least one session string is required")
+        if placement not in ("hash", "least_loaded"):
+            raise ValueError(f"Unknown assistant placement: {placement}")
+        self.assistants = [Assistant(i, session) for i, session in enumerate(session_strings)]
+        self.placement = placement
+        self.assignments = {}
+
+        # Consistent hash ring, adding an assistant only moves a share of the chats
+        ring = sorted(
+            (_hash(f"{assistant.index}:{replica}"), assistant.index)
+            for assistant in self.assistants
+            for replica in range(RING_REPLICAS)
+        )
+        self._ring_keys = [key for key, _ in ring]
+        self._ring_owners = [index for _, index in ring]
+
+    def __len__(self):
+        return len(self.assistants)
+
+    def for_chat(self, chat_id):
+        """Get the PyTgCalls client serving a chat, assigning an assistant if needed"""
+        assistant = self.assignments.get(chat_id)
+        if assistant is None:
+            assistant = self._place(chat_id)
+            assistant.chats.add(chat_id)
+            self.assignments[chat_id] = assistant
+        return assistant.call_py
+
+    def serving(self, chat_id):
+        """Get the PyTgCalls client serving a chat, or None if no assistant is assigned to it"""
+        assistant = self.assignments.get(chat_id)
+        return assistant.call_py if assistant is not None else None
+
+    def _place(self, chat_id):
+        """Pick an assistant for a new chat"""
+        if self.placement == "least_loaded":
+            return min(self.assistants, key=lambda assistant: len(assistant.chats))
+        position = bisect.bisect(self._ring_keys, _hash(str(chat_id))) % len(self._ring_keys)
+        return self.assistants[self._ring_owners[position]]
+
+    def release(self, chat_id):
+        """Forget a chat's assignment once its assistant left the call"""
+        assistant = self.assignments.pop(chat_id, None)
+        if assistant is not None:
+            assistant.chats.discard(chat_id)
+
+    def on_update(self, *args):
+        """Register a PyTgCalls update handler on every assistant"""
+        def decorator(func):
+            for assistant in self.assistants:
+                assistant.call_py.on_update(*args)(func)
+            return func
+        return decorator
+
+    async def start(self):
+        """Start every assistant's user client"""
+        for assistant in self.assistants:
+            await assistant.client.start()
+
+    async def start_calls(self):
+        """Start every assistant's PyTgCalls client"""
+        for assistant in self.assistants:
+            await assistant.call_py.start()
+
+    async def stop(self):
+        """Stop every assistant's user client"""
+        for assistant in self.assistants:
+            try:
+                await assistant.client.stop()
+            except Exception as e:
+                logger.error(f"Error stopping assistant {assistant.index}: {e}")
+
+    def stats(self):
+        """Get the number of chats per assistant"""
+        return {assistant.index: len(assistant.chats) for assistant in self.assistants}
@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import time
+import logging
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".index.json"
+
+# Prefix of the private directories downloads are written to before being moved in
+TEMP_PREFIX = ".tmp-"
+
+class CacheEntry:
+    __slots__ = ("path", "size", "last_access", "hits", "gain")
+
+    def __init__(self, path, size, last_access=None, hits=0, gain=None):
+        self.path = path
+        self.size = size
+        self.last_access = last_access or time.time()
+        self.hits = hits
+        # Loudness correction in dB, None until the file was analyzed
+        self.gain = gain
+
+class AudioCache:
+    """Size-bounded on-disk cache of downloaded audio files"""
+
+    def __init__(self, directory, max_bytes, policy="lru"):
+        """
+        Initialize the cache and rebuild its index from the directory,
+        creating the directory if it doesn't exist
+
+        Args:
+            directory: Directory holding the audio files
+            max_bytes: Byte budget for all cached files
+            policy: Eviction policy, 'lru' or 'lfu'
+        """
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown audio cache policy: {policy}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.entries = {}
+        self.total_bytes = 0
+        # Lookup counters, reported as the cache hit ratio
+        self.hits = 0
+        self.misses = 0
+        # Files currently streaming, never evicted (path -> number of users)
+        self.pins = {}
+        os.makedirs(self.directory, exist_ok=True)
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the index from the files in the directory"""
+        saved = {}
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        self.entries = {}
+        self.total_bytes = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(TEMP_PREFIX):
+                # Leftover from a download interrupted by a crash
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            video_id = os.path.splitext(name)[0]
+            meta = saved.get(video_id, {})
+            self.entries[video_id] = CacheEntry(
+                path,
+                os.path.getsize(path),
+                meta.get("last_access") or os.path.getmtime(path),
+                meta.get("hits", 0),
+                meta.get("gain"),
+            )
+            self.total_bytes += self.entries[video_id].size
+
+        logger.info(f"Audio cache: {len(self.entries)} files, {self.total_bytes} bytes")
+        self.evict()
+
+    def lookup(self, video_id, count=True):
+        """
+        Get the cached file for a video
+
+        Args:
+            video_id: YouTube video ID
+            count: Count the lookup as a hit or miss; False when checking
+                again for a video whose lookup was already counted
+
+        Returns:
+            Path to the audio file, or None if it is not cached
+        """
+        entry = self.entries.get(video_id)
+        if entry is None:
+            self.misses += count
+            return None
+        if not os.path.isfile(entry.path):
+            self._drop(video_id)
+            self.misses += count
+            return None
+        self.hits += count
+        entry.last_access = time.time()
+        entry.hits += 1
+        return entry.path
+
+    def add(self, video_id, path):
+        """Register a freshly downloaded file and evict if over budget"""
+        if video_id in self.entries:
+            self._drop(video_id)
+        entry = CacheEntry(path, os.path.getsize(path))
+        self.entries[video_id] = entry
+        self.total_bytes += entry.size
+        self.evict()
+        self.save_index()
+
+    def set_gain(self, video_id, gain):
+        """Store the loudness correction of a cached file"""
+        entry = self.entries.get(video_id)
+        if entry is not None:
+            entry.gain = gain
+            self.save_index()
+
+    def get_gain(self, path):
+        """Get the loudness correction in dB for a cached file, None if unknown"""
+        entry = self.entries.get(os.path.splitext(os.path.basename(path))[0])
+        if entry is None or entry.path != path:
+            return None
+        return entry.gain
+
+    def acquire(self, path):
+        """Pin a file while it is streaming"""
+        self.pins[path] = self.pins.get(path, 0) + 1
+
+    def release(self, path):
+        """Unpin a file once it stopped streaming"""
+        count = self.pins.get(path, 0) - 1
+        if count > 0:
+            self.pins[path] = count
+        else:
+            self.pins.pop(path, None)
+
+    def evict(self):
+        """Delete unpinned files until the cache fits in its byte budget"""
+        evicted = False
+        while self.total_bytes > self.max_bytes:
+            candidates = [
+                (video_id, entry) for video_id, entry in self.entries.items()
+                if entry.path not in self.pins
+            ]
+            if not candidates:
+                break
+            if self.policy == "lfu":
+                video_id, entry = min(candidates, key=lambda item: (item[1].hits, item[1].last_access))
+            else:
+                video_id, entry = min(candidates, key=lambda item: item[1].last_access)
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.error(f"Error removing cached file {entry.path}: {e}")
+            self._drop(video_id)
+            evicted = True
+        if evicted:
+            self.save_index()
+
+    def _drop(self, video_id):
+        """Remove an entry from the index"""
+        entry = self.entries.pop(video_id)
+        self.total_bytes -= entry.size
+
+    def save_index(self):
+        """Persist access times and hit counts next to the files"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        data = {
+            video_id: {"last_access": entry.last_access, "hits": entry.hits, "gain": entry.gain}
+            for video_id, entry in self.entries.items()
+        }
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(data, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.error(f"Error saving audio cache index: {e}")
+
+    def stats(self):
+        """Get file count, size, budget and hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'files': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'pinned': len(self.pins),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+        }
+
+# Shared cache for Config.TEMP_DOWNLOAD_DIRECTORY
+audio_cache = AudioCache(
+    Config.TEMP_DOWNLOAD_DIRECTORY,
+    Config.AUDIO_CACHE_MAX_MB * 1024 * 1024,
+    Config.AUDIO_CACHE_POLICY,
+)
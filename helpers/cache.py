@@ -0,0 +1,124 @@
+import json
+import time
+import sqlite3
+import logging
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Function to normalize search queries into cache keys
+def normalize_query(query):
+    """Normalize a search query so equivalent queries share a cache entry"""
+    return " ".join(query.lower().split())
+
+class TTLCache:
+    """In-process LRU cache with per-entry expiry and optional SQLite backing"""
+
+    def __init__(self, name, maxsize, ttl, db_path=None):
+        """
+        Initialize the cache
+
+        Args:
+            name: Cache name, also used as the SQLite table name
+            maxsize: Maximum number of entries kept in memory
+            ttl: Seconds an entry stays valid
+            db_path: Optional SQLite file so a restart starts warm
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._db = None
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} "
+                    "(key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+                )
+                self._db.execute(f"DELETE FROM {name} WHERE expires < ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening cache database {db_path}: {e}")
+                self._db = None
+
+    def get(self, key):
+        """
+        Get a value from the cache
+
+        Returns:
+            The cached value, or None on a miss or an expired entry
+        """
+        entry = self._data.get(key)
+        if entry is None and self._db is not None:
+            entry = self._load(key)
+
+        if entry is not None:
+            value, expires = entry
+            if expires > time.time():
+                self._data[key] = entry
+                self._data.move_to_end(key)
+                self._evict()
+                self.hits += 1
+                return value
+            self._data.pop(key, None)
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Store a value in the cache"""
+        entry = (value, time.time() + self.ttl)
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        self._evict()
+
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), entry[1])
+                )
+                self._db.commit()
+            except (sqlite3.Error, TypeError) as e:
+                logger.error(f"Error writing {self.name} cache entry: {e}")
+
+    def _load(self, key):
+        """Load an entry from the SQLite file"""
+        try:
+            row = self._db.execute(
+                f"SELECT value, expires FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading {self.name} cache entry: {e}")
+            return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _evict(self):
+        """Drop least recently used entries beyond maxsize"""
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries"""
+        self._data.clear()
+        if self._db is not None:
+            self._db.execute(f"DELETE FROM {self.name}")
+            self._db.commit()
+
+    def stats(self):
+        """Get size and hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _Command:
+    __slots__ = ("func", "args", "key", "future", "context")
+
+    def __init__(self, func, args, key, future):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.future = future
+        # Commands run in the context of their sender, so trace spans follow them
+        self.context = contextvars.copy_context()
+
+class ChatActor:
+    """
+    Serialize state transitions per chat while chats run in parallel
+
+    Every chat has a mailbox worked through by its own task, which only
+    exists while the mailbox has commands.
+    """
+
+    def __init__(self, coalesce_window=None):
+        """
+        Initialize the actor
+
+        Args:
+            coalesce_window: Seconds to wait for more commands of a burst before running it
+        """
+        self.coalesce_window = (
+            Config.CHAT_COALESCE_WINDOW if coalesce_window is None else coalesce_window
+        )
+        self._mailboxes = {}
+        self._workers = {}
+
+    async def submit(self, chat_id, func, *args, coalesce=None):
+        """
+        Queue a command for a chat and wait for its result
+
+        Args:
+            chat_id: ID of the chat
+            func: Coroutine function to run
+            *args: Arguments for the function
+            coalesce: Optional key; consecutive commands with the same key
+                run as one call of func with the list of their argument tuples
+
+        Returns:
+            The return value of func
+        """
+        future = asyncio.get_running_loop().create_future()
+        mailbox = self._mailboxes.get(chat_id)
+        if mailbox is None:
+            mailbox = self._mailboxes[chat_id] = deque()
+        mailbox.append(_Command(func, args, coalesce, future))
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.ensure_future(self._run(chat_id, mailbox))
+        return await future
+
+    async def _run(self, chat_id, mailbox):
+        """Work through a chat's mailbox one command at a time"""
+        batch = []
+        try:
+            while mailbox:
+                command = mailbox.popleft()
+                batch = [command]
+
+                if command.key is not None:
+                    # Let the rest of a burst arrive, then take it in one go
+                    if self.coalesce_window:
+                        await asyncio.sleep(self.coalesce_window)
+                    while mailbox and mailbox[0].key == command.key:
+                        batch.append(mailbox.popleft())
+                    if len(batch) > 1:
+                        logger.info(f"Coalesced {len(batch)} '{command.key}' commands in chat {chat_id}")
+
+                try:
+                    if command.key is not None:
+                        coro = command.func([item.args for item in batch])
+                    else:
+                        coro = command.func(*command.args)
+                    result = await asyncio.create_task(coro, context=command.context)
+                except asyncio.CancelledError:
+                    for item in batch:
+                        item.future.cancel()
+                    # Only the command was cancelled, go on with the next one
+                    if asyncio.current_task().cancelling():
+                        raise
+                except Exception as e:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                else:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_result(result)
+        except BaseException:
+            # Nothing works through this mailbox any more, so release everyone waiting on it
+            for item in batch + list(mailbox):
+                item.future.cancel()
+            raise
+        finally:
+            del self._mailboxes[chat_id]
+            del self._workers[chat_id]
+
+    def stats(self):
+        """Get the number of busy chats and queued commands"""
+        return {
+            'active_chats': len(self._workers),
+            'queued_commands': sum(len(mailbox) for mailbox in self._mailboxes.values()),
+        }
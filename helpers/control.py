@@ -0,0 +1,189 @@
+import os
+import json
+import asyncio
+import logging
+import aiohttp
+from aiohttp import web
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Host part of control API URLs, the connection itself goes over the Unix socket
+BASE_URL = "http://bot-service"
+
+def query_int(request, name, default):
+    """Integer query parameter, the default if it is missing or not a number (like Flask's type=int)"""
+    try:
+        return int(request.query.get(name, default))
+    except ValueError:
+        return default
+
+def create_control_app(runtime):
+    """
+    Control API of the bot service, served on a local Unix socket
+
+    Args:
+        runtime: BotRuntime of the service process
+    """
+    # Imported here, web workers only need the client side
+    from helpers.metrics import registry
+    from helpers.tracing import tracer
+
+    routes = web.RouteTableDef()
+
+    @routes.get('/status')
+    async def status(request):
+        return web.json_response({"running": runtime.running, "status": runtime.status, "error": runtime.error})
+
+    @routes.post('/start')
+    async def start(request):
+        return web.json_response({"status": runtime.start()})
+
+    @routes.get('/events')
+    async def events(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            async for data in runtime.subscribe():
+                await response.write(f"data: {data}\n\n".encode())
+        except ConnectionResetError:
+            pass
+        return response
+
+    @routes.get('/metrics')
+    async def metrics(request):
+        return web.Response(text=registry.render())
+
+    @routes.get('/traces')
+    async def traces(request):
+        limit = query_int(request, 'limit', 20)
+        return web.json_response(
+            {"summary": tracer.summary(), "traces": tracer.recent_traces(limit)},
+            dumps=lambda data: json.dumps(data, default=str),
+        )
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+class ServiceUnavailable(Exception):
+    pass
+
+class ControlClient:
+    """Client of the bot service's control API, used by the stateless web workers"""
+
+    def __init__(self, socket_path=None):
+        """
+        Args:
+            socket_path: Unix socket of the bot service
+        """
+        self.socket_path = socket_path or Config.CONTROL_SOCKET
+        self._session = None
+        # One upstream event stream per web worker, shared by all its viewers
+        self._subscribers = set()
+        self._relay = None
+        self._latest = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=self.socket_path),
+                timeout=aiohttp.ClientTimeout(total=Config.CONTROL_TIMEOUT),
+            )
+        return self._session
+
+    async def _request(self, method, path, **kwargs):
+        """Call the control API, raising ServiceUnavailable when the service can't be reached"""
+        try:
+            async with self._get_session().request(method, BASE_URL + path, **kwargs) as response:
+                response.raise_for_status()
+                if response.content_type == "application/json":
+                    return await response.json()
+                return await response.text()
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            raise ServiceUnavailable(f"Bot service unavailable: {e}")
+
+    async def status(self):
+        return await self._request("GET", "/status")
+
+    async def start(self):
+        return await self._request("POST", "/start")
+
+    async def metrics(self):
+        return await self._request("GET", "/metrics")
+
+    async def traces(self, limit=20):
+        return await self._request("GET", "/traces", params={"limit": limit})
+
+    async def subscribe(self):
+        """
+        Yield the service's serialized state as it is pushed
+
+        While the service is down, a state with status 'unavailable' is
+        yielded and the stream reconnects in the background.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._latest is not None:
+            queue.put_nowait(self._latest)
+        if self._relay is None:
+            self._relay = asyncio.ensure_future(self._relay_events())
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+    def _publish(self, data):
+        self._latest = data
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _relay_events(self):
+        """Read the service's event stream while anyone here is subscribed"""
+        try:
+            while self._subscribers:
+                try:
+                    async with self._get_session().get(
+                        BASE_URL + "/events", timeout=aiohttp.ClientTimeout(total=None, sock_read=None)
+                    ) as response:
+                        async for line in response.content:
+                            if line.startswith(b"data: "):
+                                self._publish(line[len(b"data: "):].decode().strip())
+                            if not self._subscribers:
+                                return
+                except (aiohttp.ClientError, OSError) as e:
+                    logger.warning(f"Bot service event stream lost: {e}")
+                self._publish(json.dumps({"status": "unavailable", "running": False, "error": None}))
+                await asyncio.sleep(Config.CONTROL_RETRY_DELAY)
+        finally:
+            self._relay = None
+            self._latest = None
+
+    async def close(self):
+        if self._relay is not None:
+            self._relay.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+async def serve_control(runtime, socket_path=None):
+    """
+    Serve the control API on the Unix socket
+
+    Returns:
+        AppRunner, call cleanup() on it to stop serving
+    """
+    socket_path = socket_path or Config.CONTROL_SOCKET
+    # Left behind if the previous service process crashed
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    runner = web.AppRunner(create_control_app(runtime))
+    await runner.setup()
+    site = web.UnixSite(runner, socket_path)
+    await site.start()
+    logger.info(f"Control API listening on {socket_path}")
+    return runner
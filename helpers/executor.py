@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job state for the worker thread currently running a job
+_local = threading.local()
+
+class JobCancelled(Exception):
+    pass
+
+class JobTimeout(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+def raise_if_cancelled():
+    """
+    Abort the current job if it has been cancelled or timed out
+
+    Meant to be called from inside blocking work (e.g. a yt-dlp progress hook)
+    so long downloads stop as soon as nobody is waiting for them anymore.
+    """
+    job = getattr(_local, "job", None)
+    if job is not None and job.cancelled.is_set():
+        raise JobCancelled("Job was cancelled")
+
+class ExtractionExecutor:
+    """Run blocking yt-dlp work in bounded thread pools off the event loop"""
+
+    def __init__(self, search_workers=None, download_workers=None):
+        """
+        Initialize the executor
+
+        Args:
+            search_workers: Number of threads for searches and metadata lookups
+            download_workers: Number of threads for downloads
+        """
+        workers = {
+            'search': search_workers or Config.YTDL_SEARCH_WORKERS,
+            'download': download_workers or Config.YTDL_DOWNLOAD_WORKERS,
+        }
+        self.workers = workers
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"ytdl-{name}")
+            for name, count in workers.items()
+        }
+        self.timeouts = {
+            'search': Config.YTDL_SEARCH_TIMEOUT,
+            'download': Config.YTDL_DOWNLOAD_TIMEOUT,
+        }
+        self._queued = {name: 0 for name in workers}
+        self._running = {name: 0 for name in workers}
+        self._lock = threading.Lock()
+
+    async def run(self, pool, func, *args, timeout=None):
+        """
+        Run a blocking function in one of the pools
+
+        Args:
+            pool: Pool name ('search' or 'download')
+            func: Blocking callable
+            *args: Arguments for the callable
+            timeout: Seconds to wait before cancelling the job (defaults per pool)
+
+        Returns:
+            The return value of the callable
+        """
+        if timeout is None:
+            timeout = self.timeouts[pool]
+        job = _Job()
+
+        def _call():
+            with self._lock:
+                self._queued[pool] -= 1
+                self._running[pool] += 1
+            _local.job = job
+            try:
+                raise_if_cancelled()
+                return func(*args)
+            finally:
+                _local.job = None
+                with self._lock:
+                    self._running[pool] -= 1
+
+        with self._lock:
+            self._queued[pool] += 1
+        future = self.pools[pool].submit(_call)
+        future.add_done_callback(lambda f: self._on_done(pool, f))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            job.cancelled.set()
+            logger.warning(f"{pool} job {getattr(func, '__name__', func)} timed out after {timeout}s")
+            raise JobTimeout(f"Timed out after {timeout} seconds")
+        except asyncio.CancelledError:
+            job.cancelled.set()
+            raise
+
+    def _on_done(self, pool, future):
+        """Keep the queue depth correct for jobs cancelled before they started"""
+        if future.cancelled():
+            with self._lock:
+                self._queued[pool] -= 1
+
+    def stats(self):
+        """Get worker counts and queue depth for every pool"""
+        with self._lock:
+            return {
+                name: {
+                    'workers': self.workers[name],
+                    'queued': self._queued[name],
+                    'running': self._running[name],
+                }
+                for name in self.pools
+            }
+
+    def shutdown(self, wait=False):
+        """Shut down all pools"""
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+# Shared executor used by the YouTube helpers
+ytdl_executor = ExtractionExecutor()
@@ -0,0 +1,80 @@
+import re
+import json
+import logging
+from config import Config
+from helpers.audio_cache import audio_cache
+from helpers.transcoder import transcoder, PRIORITY_BACKGROUND
+from helpers.tracing import detached
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Limits for the correction, so near-silent or clipped uploads don't blow up
+MIN_GAIN = -20.0
+MAX_GAIN = 10.0
+
+# Analyses running, keyed by video ID
+_pending = {}
+
+# Function to schedule the loudness analysis of a cached file
+def ensure_analyzed(video_id, path):
+    """
+    Analyze a cached file in the background unless its gain is already known
+
+    Args:
+        video_id: YouTube video ID of the cached file
+        path: Path to the audio file
+    """
+    if not Config.LOUDNESS_NORMALIZATION or video_id in _pending:
+        return
+    if audio_cache.get_gain(path) is not None:
+        return
+
+    task = detached(_analyze(video_id, path))
+    _pending[video_id] = task
+    task.add_done_callback(lambda _: _pending.pop(video_id, None))
+
+async def _analyze(video_id, path):
+    """Measure integrated loudness (EBU R128) and store the correction in the cache index"""
+    try:
+        loudness = await measure_loudness(path)
+    except Exception as e:
+        logger.warning(f"Error analyzing loudness of {path}: {e}")
+        return
+    gain = round(max(MIN_GAIN, min(MAX_GAIN, Config.LOUDNESS_TARGET - loudness)), 2)
+    audio_cache.set_gain(video_id, gain)
+    logger.info(f"Loudness of {video_id}: {loudness} LUFS, gain {gain} dB")
+
+# Function to measure the integrated loudness of a file
+async def measure_loudness(path):
+    """
+    Measure the integrated loudness of a file with ffmpeg's loudnorm filter
+
+    Returns:
+        Integrated loudness in LUFS
+    """
+    result = await transcoder.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-i", path, "-vn",
+         "-af", f"loudnorm=I={Config.LOUDNESS_TARGET}:print_format=json", "-f", "null", "-"],
+        PRIORITY_BACKGROUND,
+    )
+    # loudnorm prints its measurements as the last JSON object on stderr
+    match = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", result['stderr'])
+    if not match:
+        raise ValueError("No loudness measurement in ffmpeg output")
+    loudness = float(json.loads(match.group(0))["input_i"])
+    if loudness == float("-inf"):
+        raise ValueError("Silent audio")
+    return loudness
+
+# Function to build the ffmpeg parameters applying a file's gain
+def volume_parameters(path):
+    """Get ffmpeg parameters applying the stored gain of a file, or None"""
+    if not Config.LOUDNESS_NORMALIZATION:
+        return None
+    gain = audio_cache.get_gain(path)
+    if not gain:
+        return None
+    # Untagged parameters go before -i, where ffmpeg rejects a filter; -atend makes it an output option
+    return f"-atend -af volume={gain}dB"
@@ -0,0 +1,220 @@
+import time
+import asyncio
+import bisect
+import logging
+import functools
+import itertools
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _format_labels(names, values):
+    """Format label names and values for the text exposition format"""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+class Counter:
+    """Monotonically increasing value per label set"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self.labels, values, value) for values, value in items]
+
+class Gauge:
+    """Current value per label set, either set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        """
+        Args:
+            callback: Optional function returning (label values tuple, value) pairs,
+                called only when metrics are scraped
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def samples(self):
+        if self.callback is not None:
+            items = list(self.callback())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [(self.name, self.labels, values, value) for values, value in items]
+
+class Histogram:
+    """Distribution of observed values per label set"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Label values -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(label_values)
+            if data is None:
+                data = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(data)) for values, data in self._values.items()]
+        samples = []
+        bucket_labels = self.labels + ("le",)
+        for values, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", bucket_labels, values + (bound,), cumulative))
+            samples.append((f"{self.name}_bucket", bucket_labels, values + ("+Inf",), data[-1]))
+            samples.append((f"{self.name}_sum", self.labels, values, data[-2]))
+            samples.append((f"{self.name}_count", self.labels, values, data[-1]))
+        return samples
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), callback=None):
+        return self._add(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render every metric, running gauge callbacks now"""
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, label_names, label_values, value in samples:
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {value}")
+        return "\n".join(lines) + "\n"
+
+# Shared registry exported on /metrics
+registry = Registry()
+
+# Metrics shared by the bot and the helpers
+search_seconds = registry.histogram(
+    "musicbot_search_seconds", "Time to answer a YouTube search", ("cache",)
+)
+download_seconds = registry.histogram(
+    "musicbot_download_seconds", "Time to download and prepare a song"
+)
+download_bytes = registry.counter(
+    "musicbot_download_bytes_total", "Bytes of audio added to the cache"
+)
+stream_call_seconds = registry.histogram(
+    "musicbot_stream_call_seconds", "Duration of PyTgCalls operations", ("call",)
+)
+stream_call_errors = registry.counter(
+    "musicbot_stream_call_errors_total", "Failed PyTgCalls operations", ("call",)
+)
+handler_seconds = registry.histogram(
+    "musicbot_handler_seconds", "Duration of bot handlers", ("handler",)
+)
+handler_errors = registry.counter(
+    "musicbot_handler_errors_total", "Bot handlers that raised", ("handler",)
+)
+loop_lag_seconds = registry.gauge(
+    "musicbot_event_loop_lag_seconds", "Latest measured event loop scheduling lag"
+)
+loop_stalls = registry.counter(
+    "musicbot_event_loop_stalls_total", "Times the event loop was blocked past the watchdog threshold"
+)
+slow_handlers = registry.counter(
+    "musicbot_slow_handlers_total", "Handlers that ran past the watchdog handler threshold", ("handler",)
+)
+
+# Handlers running right now: id -> (handler name, start time, task)
+handlers_in_flight = {}
+_handler_ids = itertools.count()
+registry.gauge(
+    "musicbot_handlers_in_flight", "Handlers currently running",
+    callback=lambda: [((), len(handlers_in_flight))]
+)
+
+def timed(histogram, errors, label):
+    """Decorator timing a coroutine function into a histogram and counting its errors"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                errors.inc(1, label)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, label)
+        return wrapper
+    return decorator
+
+def instrumented(func):
+    """Decorator for bot handlers: time every call, count errors and track it for the watchdog"""
+    name = func.__name__
+    timed_func = timed(handler_seconds, handler_errors, name)(func)
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        handler_id = next(_handler_ids)
+        handlers_in_flight[handler_id] = (name, time.monotonic(), asyncio.current_task())
+        try:
+            return await timed_func(*args, **kwargs)
+        finally:
+            del handlers_in_flight[handler_id]
+    return wrapper
@@ -0,0 +1,274 @@
+import time
+import heapq
+import itertools
+import asyncio
+import logging
+from collections import deque
+from pyrogram.errors import FloodWait
+from config import Config
+from helpers.metrics import registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+outbox_sent = registry.counter(
+    "musicbot_outbox_sent_total", "Messages sent or edited by the outbox", ("kind",)
+)
+outbox_collapsed = registry.counter(
+    "musicbot_outbox_collapsed_total", "Edits and notifications replaced by a newer one before sending"
+)
+outbox_flood_waits = registry.counter(
+    "musicbot_outbox_flood_waits_total", "FloodWait errors that rescheduled a chat"
+)
+
+class TokenBucket:
+    """Allow `rate` operations per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+class _Op:
+    __slots__ = ("kind", "chat_id", "args", "kwargs", "key", "critical", "futures")
+
+    def __init__(self, kind, chat_id, args, kwargs, key, critical, future):
+        self.kind = kind
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.critical = critical
+        self.futures = [future] if future is not None else []
+
+class Outbox:
+    """
+    Rate-limited sender for everything the bot posts to chats
+
+    Operations are queued per chat and sent in order, one at a time per
+    chat, within a per-chat and a global rate. Pending edits of the same
+    message, and pending notifications with the same key, collapse into
+    the latest one. A FloodWait puts the chat on hold and retries later
+    instead of blocking the handler that queued the message.
+    """
+
+    def __init__(self, client, global_rate=None, chat_rate=None, chat_burst=None):
+        """
+        Args:
+            client: Pyrogram client used to send
+            global_rate: Messages per second across all chats
+            chat_rate: Messages per second in one chat
+            chat_burst: Messages a chat may get at once before chat_rate applies
+        """
+        self.client = client
+        self.chat_rate = chat_rate or Config.OUTBOX_CHAT_RATE
+        self.chat_burst = chat_burst or Config.OUTBOX_CHAT_BURST
+        global_rate = global_rate or Config.OUTBOX_GLOBAL_RATE
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._queues = {}
+        self._buckets = {}
+        self._hold_until = {}
+        # Chats waiting to send as (time, seq, chat_id), one heap for chats whose next
+        # operation is a send a handler waits for, served first, and one for the rest
+        self._ready = {True: [], False: []}
+        # Current heap entry per chat as (critical, time, seq), older entries are skipped
+        self._entries = {}
+        self._seq = itertools.count()
+        self._busy = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.sent = 0
+        self.collapsed = 0
+        self.flood_waits = 0
+
+    async def send(self, chat_id, text, **kwargs):
+        """Send a message and wait for it, ahead of the chat's queued notifications"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Op("send", chat_id, (text,), kwargs, None, True, future))
+        return await future
+
+    def post(self, chat_id, text, key=None, **kwargs):
+        """
+        Queue a notification without waiting for it
+
+        Args:
+            key: Optional key; a pending notification with the same key is
+                replaced by this one, so only the latest status gets sent
+        """
+        self._enqueue(_Op("send", chat_id, (text,), kwargs, key and f"post:{key}", False, None))
+
+    def reply(self, message, text, **kwargs):
+        """Queue a reply to a message without waiting for it"""
+        self.post(message.chat.id, text, reply_to_message_id=message.id, **kwargs)
+
+    def edit(self, message, text, **kwargs):
+        """Queue an edit of a sent message; a pending edit of it is replaced"""
+        chat_id = message.chat.id
+        self._enqueue(_Op("edit", chat_id, (message.id, text), kwargs, f"edit:{message.id}", False, None))
+
+    def _enqueue(self, op):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+        queue = self._queues.get(op.chat_id)
+        if queue is None:
+            queue = self._queues[op.chat_id] = deque()
+
+        # Replace a pending operation with the same key, keeping its place
+        if op.key is not None:
+            for index, pending in enumerate(queue):
+                if pending.key == op.key:
+                    op.futures = pending.futures + op.futures
+                    queue[index] = op
+                    self.collapsed += 1
+                    outbox_collapsed.inc()
+                    return
+
+        if op.critical:
+            # After other waiting sends, before queued notifications
+            index = next((i for i, pending in enumerate(queue) if not pending.critical), len(queue))
+            queue.insert(index, op)
+        else:
+            queue.append(op)
+        self._schedule(op.chat_id)
+
+    def _schedule(self, chat_id):
+        """Put a chat with queued operations on the ready heap matching its next operation"""
+        queue = self._queues.get(chat_id)
+        if chat_id in self._busy or not queue:
+            return
+        critical = queue[0].critical
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry[0] == critical:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(chat_id)
+        delay = bucket.delay(now) if bucket else 0.0
+        at = max(now + delay, self._hold_until.get(chat_id, 0.0))
+        seq = next(self._seq)
+        heapq.heappush(self._ready[critical], (at, seq, chat_id))
+        self._entries[chat_id] = (critical, at, seq)
+        self._wakeup.set()
+
+    def _head(self, critical):
+        """Earliest current entry of a heap, dropping replaced ones"""
+        heap = self._ready[critical]
+        while heap:
+            at, seq, chat_id = heap[0]
+            if self._entries.get(chat_id) == (critical, at, seq):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    async def _run(self):
+        """Hand out send slots to chats in order of readiness, waited-for sends first"""
+        while True:
+            now = time.monotonic()
+            heads = [(critical, head) for critical in (True, False) if (head := self._head(critical))]
+            if not heads:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready = next(((critical, head) for critical, head in heads if head[0] <= now), None)
+            delay = self.global_bucket.delay(now)
+            if ready is None:
+                delay = max(delay, min(head[0] for _, head in heads) - now)
+            if delay > 0:
+                # A newly queued chat may be ready sooner
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            critical, (_, _, chat_id) = ready
+            heapq.heappop(self._ready[critical])
+            del self._entries[chat_id]
+            op = self._queues[chat_id].popleft()
+            bucket = self._buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            bucket.take(now)
+            self.global_bucket.take(now)
+            self._busy.add(chat_id)
+            asyncio.ensure_future(self._deliver(op))
+
+    async def _deliver(self, op):
+        """Run one operation and schedule the chat's next one"""
+        chat_id = op.chat_id
+        try:
+            if op.kind == "send":
+                result = await self.client.send_message(chat_id, *op.args, **op.kwargs)
+            else:
+                result = await self.client.edit_message_text(chat_id, *op.args, **op.kwargs)
+        except FloodWait as e:
+            # Telegram says when to come back; the message goes out first then
+            self.flood_waits += 1
+            outbox_flood_waits.inc()
+            logger.warning(f"FloodWait of {e.value}s in chat {chat_id}, rescheduling")
+            self._hold_until[chat_id] = time.monotonic() + e.value
+            self._queues[chat_id].appendleft(op)
+        except Exception as e:
+            if op.futures:
+                for future in op.futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                logger.error(f"Error sending to chat {chat_id}: {e}")
+        else:
+            self.sent += 1
+            outbox_sent.inc(1, op.kind)
+            for future in op.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._busy.discard(chat_id)
+            self._finish(chat_id)
+
+    def _finish(self, chat_id):
+        """Schedule the chat's next operation, or forget the idle chat"""
+        if self._queues.get(chat_id):
+            self._schedule(chat_id)
+            return
+        self._queues.pop(chat_id, None)
+        now = time.monotonic()
+        if self._hold_until.get(chat_id, 0.0) <= now:
+            self._hold_until.pop(chat_id, None)
+        # A full bucket is the same as no bucket, drop those of idle chats now and then
+        if len(self._buckets) > 1024:
+            for idle_chat_id in [
+                idle_chat_id for idle_chat_id, bucket in self._buckets.items()
+                if idle_chat_id not in self._queues and bucket.full(now)
+            ]:
+                del self._buckets[idle_chat_id]
+
+    def stats(self):
+        """Get queued operations and send/collapse/FloodWait counters"""
+        return {
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'chats': len(self._queues),
+            'sent': self.sent,
+            'collapsed': self.collapsed,
+            'flood_waits': self.flood_waits,
+        }
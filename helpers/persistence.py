@@ -0,0 +1,132 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class QueueStore:
+    """SQLite (WAL) store for chat queues with batched background writes"""
+
+    def __init__(self, path, flush_interval=1.0):
+        """
+        Initialize the store
+
+        Args:
+            path: SQLite database file
+            flush_interval: Seconds between batched writes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        # Latest snapshot per chat waiting to be written (None = delete)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS queues "
+            "(chat_id INTEGER PRIMARY KEY, tracks TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        db.commit()
+        db.close()
+
+    def _connect(self):
+        """Open a connection in WAL mode"""
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._thread is None:
+            # Set by an earlier close(), the store is started again when the bot restarts
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="queue-store", daemon=True)
+            self._thread.start()
+
+    def save(self, chat_id, tracks):
+        """
+        Schedule a chat's queue to be written
+
+        Only the latest snapshot per chat is kept, so bursts of changes
+        collapse into a single write. Never blocks on disk.
+
+        Args:
+            chat_id: ID of the chat
+            tracks: List of track dictionaries, empty to delete the queue
+        """
+        with self._lock:
+            self._pending[chat_id] = tracks or None
+
+    def load_all(self):
+        """
+        Load every stored queue
+
+        Returns:
+            Dictionary of chat ID -> list of track dictionaries
+        """
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT chat_id, tracks FROM queues ORDER BY updated").fetchall()
+        finally:
+            db.close()
+        return {chat_id: json.loads(tracks) for chat_id, tracks in rows}
+
+    def flush(self, db=None):
+        """Write all pending snapshots in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        own_db = db is None
+        if own_db:
+            db = self._connect()
+        try:
+            now = time.time()
+            with db:
+                db.executemany(
+                    "DELETE FROM queues WHERE chat_id = ?",
+                    [(chat_id,) for chat_id, tracks in pending.items() if tracks is None]
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO queues (chat_id, tracks, updated) VALUES (?, ?, ?)",
+                    [
+                        (chat_id, json.dumps(tracks), now)
+                        for chat_id, tracks in pending.items() if tracks is not None
+                    ]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing queues: {e}")
+            # Put the snapshots back unless newer ones arrived meanwhile
+            with self._lock:
+                for chat_id, tracks in pending.items():
+                    self._pending.setdefault(chat_id, tracks)
+        finally:
+            if own_db:
+                db.close()
+
+    def _run(self):
+        """Background writer loop"""
+        db = self._connect()
+        try:
+            while not self._stop.wait(self.flush_interval):
+                self.flush(db)
+            self.flush(db)
+        finally:
+            db.close()
+
+    def close(self):
+        """Write everything still pending and stop the writer"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from config import Config
+from helpers.youtube import get_stream_source
+from helpers.transcoder import PRIORITY_PREFETCH
+from helpers.tracing import detached
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Prefetcher:
+    """Download upcoming queue entries in the background while the current one plays"""
+
+    def __init__(self, depth=None, concurrency=None):
+        """
+        Initialize the prefetcher
+
+        Args:
+            depth: Number of upcoming songs to prefetch per chat
+            concurrency: Maximum prefetches running at once across all chats
+        """
+        self.depth = Config.PREFETCH_DEPTH if depth is None else depth
+        self.concurrency = concurrency or Config.PREFETCH_CONCURRENCY
+        self._semaphore = None
+        # Prefetches scheduled or running, keyed by URL
+        self._tasks = {}
+
+    def schedule(self, songs):
+        """
+        Start prefetching songs that are not already being prefetched
+
+        Args:
+            songs: Upcoming songs, nearest first
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        for song in songs[:self.depth]:
+            url = song.url
+            if url in self._tasks:
+                continue
+            task = detached(self._prefetch(url))
+            self._tasks[url] = task
+            task.add_done_callback(lambda _, url=url: self._tasks.pop(url, None))
+
+    async def _prefetch(self, url):
+        """Download or resolve one song, waiting for a free prefetch slot first"""
+        async with self._semaphore:
+            try:
+                await get_stream_source(url, PRIORITY_PREFETCH)
+                logger.info(f"Prefetched {url}")
+            except Exception as e:
+                # The song is retried when it actually comes up
+                logger.warning(f"Error prefetching {url}: {e}")
+
+    def stats(self):
+        """Get the number of pending prefetches"""
+        return {'pending': len(self._tasks), 'concurrency': self.concurrency}
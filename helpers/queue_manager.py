@@ -1,41 +1,111 @@
+import random
+from collections import deque
+from itertools import islice
 from config import Config
 
+class Track:
+    """A queued song"""
+    __slots__ = ("title", "url", "requested_by", "duration")
+    
+    def __init__(self, title, url, requested_by, duration=None):
+        self.title = title
+        self.url = url
+        self.requested_by = requested_by
+        self.duration = duration
+    
+    def to_dict(self):
+        """Get the track as a plain dictionary"""
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create a track from a dictionary made by to_dict"""
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
 class QueueManager:
-    def __init__(self):
-        """Initialize the queue manager"""
-        # Store queues for each chat
+    def __init__(self, store=None):
+        """
+        Initialize the queue manager
+        
+        Args:
+            store: Optional QueueStore that keeps queues across restarts
+        """
+        # Store queues for each chat, only while they hold songs
         self.queues = {}
         self.max_queue_size = Config.MAX_QUEUE_SIZE
+        self.store = store
+    
+    def restore(self, owns=None):
+        """
+        Reload the queues saved by the store
+        
+        Args:
+            owns: Optional predicate, only chats it accepts are reloaded
+        
+        Returns:
+            IDs of the chats that had songs queued
+        """
+        if self.store is None:
+            return []
+        
+        for chat_id, tracks in self.store.load_all().items():
+            if owns is None or owns(chat_id):
+                self.queues[chat_id] = deque(Track.from_dict(track) for track in tracks)
+        self.store.start()
+        return list(self.queues)
+    
+    def _persist(self, chat_id):
+        """Hand a chat's queue to the store after it changed"""
+        if self.store is not None:
+            self.store.save(chat_id, [track.to_dict() for track in self.queues.get(chat_id, ())])
     
     def get_queue(self, chat_id):
-        """Get the queue for a specific chat"""
-        if chat_id not in self.queues:
-            self.queues[chat_id] = []
-        return self.queues[chat_id]
+        """Get the queue for a specific chat (empty tuple if there is none)"""
+        return self.queues.get(chat_id, ())
     
-    def add_to_queue(self, chat_id, song_info):
+    def add_to_queue(self, chat_id, track):
         """
         Add a song to the queue
         
         Args:
             chat_id: ID of the chat
-            song_info: Dictionary with song information
+            track: Track to add
             
         Returns:
             Position in queue (1 = currently playing, 2+ = in queue)
         """
-        if chat_id not in self.queues:
-            self.queues[chat_id] = []
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            queue = self.queues[chat_id] = deque()
         
         # Check if queue is full
-        if len(self.queues[chat_id]) >= self.max_queue_size:
+        if len(queue) >= self.max_queue_size:
             raise ValueError(f"Queue is full (max {self.max_queue_size} songs)")
         
         # Add the song to the queue
-        self.queues[chat_id].append(song_info)
+        queue.append(track)
+        self._persist(chat_id)
         
         # Return position in queue (1-based)
-        return len(self.queues[chat_id])
+        return len(queue)
+    
+    def insert_next(self, chat_id, track):
+        """
+        Add a song right after the current one
+        
+        Returns:
+            Position in queue (1 if nothing was playing, otherwise 2)
+        """
+        queue = self.queues.get(chat_id)
+        if not queue:
+            return self.add_to_queue(chat_id, track)
+        
+        if len(queue) >= self.max_queue_size:
+            raise ValueError(f"Queue is full (max {self.max_queue_size} songs)")
+        
+        queue.insert(1, track)
+        self._persist(chat_id)
+        return 2
     
     def skip(self, chat_id):
         """
@@ -47,28 +117,91 @@ class QueueManager:
         Returns:
             The next song in queue, or None if queue is empty
         """
-        if chat_id not in self.queues or not self.queues[chat_id]:
+        queue = self.queues.get(chat_id)
+        if not queue:
             return None
         
         # Remove the current song (first in queue)
-        self.queues[chat_id].pop(0)
+        queue.popleft()
         
-        # Return the new first song, or None if queue is empty
-        if self.queues[chat_id]:
-            return self.queues[chat_id][0]
-        return None
+        # Return the new first song, or drop the chat's state if queue is empty
+        if not queue:
+            del self.queues[chat_id]
+        self._persist(chat_id)
+        return queue[0] if queue else None
+    
+    def remove(self, chat_id, position):
+        """
+        Remove an upcoming song
+        
+        Args:
+            chat_id: ID of the chat
+            position: 1-based position, 2 or higher (the current song can only be skipped)
+            
+        Returns:
+            The removed track
+        """
+        queue = self._upcoming_queue(chat_id, position)
+        track = queue[position - 1]
+        del queue[position - 1]
+        self._persist(chat_id)
+        return track
+    
+    def move(self, chat_id, from_position, to_position):
+        """
+        Move an upcoming song to another upcoming position
+        
+        Returns:
+            The moved track
+        """
+        queue = self._upcoming_queue(chat_id, from_position, to_position)
+        track = queue[from_position - 1]
+        del queue[from_position - 1]
+        queue.insert(to_position - 1, track)
+        self._persist(chat_id)
+        return track
+    
+    def shuffle(self, chat_id):
+        """Shuffle the upcoming songs, keeping the current one in place"""
+        queue = self.queues.get(chat_id)
+        if not queue or len(queue) < 3:
+            return
+        
+        upcoming = list(islice(queue, 1, None))
+        random.shuffle(upcoming)
+        self.queues[chat_id] = deque([queue[0]] + upcoming)
+        self._persist(chat_id)
+    
+    def _upcoming_queue(self, chat_id, *positions):
+        """Get a chat's queue after checking positions point at upcoming songs"""
+        queue = self.queues.get(chat_id)
+        size = len(queue) if queue else 0
+        if size < 2:
+            raise ValueError("There are no upcoming songs in the queue")
+        for position in positions:
+            if not 2 <= position <= size:
+                raise ValueError(f"Position must be between 2 and {size}")
+        return queue
     
     def clear_queue(self, chat_id):
         """Clear the queue for a specific chat"""
-        if chat_id in self.queues:
-            self.queues[chat_id] = []
+        if self.queues.pop(chat_id, None) is not None:
+            self._persist(chat_id)
     
     def is_empty(self, chat_id):
         """Check if the queue is empty"""
-        return chat_id not in self.queues or not self.queues[chat_id]
+        return not self.queues.get(chat_id)
     
     def get_current_song(self, chat_id):
         """Get the currently playing song"""
-        if chat_id in self.queues and self.queues[chat_id]:
-            return self.queues[chat_id][0]
+        queue = self.queues.get(chat_id)
+        if queue:
+            return queue[0]
         return None
+    
+    def get_upcoming(self, chat_id, count):
+        """Get up to count songs queued after the current one"""
+        queue = self.queues.get(chat_id)
+        if not queue:
+            return []
+        return list(islice(queue, 1, count + 1))
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from collections import Counter
+from config import Config
+from helpers.cache import TTLCache
+from helpers.executor import JobTimeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class KnownFailure(Exception):
+    pass
+
+class RetryPolicy:
+    __slots__ = ("retries", "base_delay", "max_delay")
+
+    def __init__(self, retries, base_delay=0.0, max_delay=0.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Exponential backoff for the given retry attempt (0-based)"""
+        return min(self.base_delay * 2 ** attempt, self.max_delay)
+
+# Retries per error class; permanent failures are never retried
+POLICIES = {
+    'network': RetryPolicy(3, 2.0, 30.0),
+    'rate_limited': RetryPolicy(2, 10.0, 60.0),
+    'unknown': RetryPolicy(1, 1.0, 10.0),
+    # A job that hit its timeout would only hold up the chat for as long again
+    'timeout': RetryPolicy(0),
+    'unavailable': RetryPolicy(0),
+    'no_call': RetryPolicy(0),
+}
+
+# Error message fragments (lowercase) per error class, checked in order
+ERROR_PATTERNS = (
+    ('no_call', ("no active group call", "group call not found")),
+    ('unavailable', (
+        "video unavailable", "private video", "not available", "has been removed",
+        "copyright", "sign in to confirm", "members-only", "invalid youtube url",
+        "age-restricted", "in your country",
+    )),
+    ('rate_limited', ("http error 429", "too many requests")),
+    ('network', (
+        "timed out", "timeout", "connection", "temporary failure", "http error 5",
+        "unable to download", "network is unreachable",
+    )),
+)
+
+class FailureScheduler:
+    """Bounded, backoff-aware retries and a negative cache of videos known to fail"""
+
+    def __init__(self, negative_ttl=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            negative_ttl: Seconds a video that failed permanently is not tried again
+        """
+        self.negative_cache = TTLCache(
+            "failed_videos", 4096, Config.FAILED_VIDEO_TTL if negative_ttl is None else negative_ttl
+        )
+        self.failures = Counter()
+
+    def classify(self, error):
+        """Get the error class of an exception"""
+        # Wrapped errors keep the original as __cause__, whose type decides first
+        cause = error
+        while cause is not None:
+            if isinstance(cause, KnownFailure):
+                return 'unavailable'
+            if isinstance(cause, (JobTimeout, asyncio.TimeoutError)):
+                return 'timeout'
+            cause = cause.__cause__
+        message = str(error).lower()
+        for error_class, patterns in ERROR_PATTERNS:
+            if any(pattern in message for pattern in patterns):
+                return error_class
+        return 'unknown'
+
+    def is_permanent(self, error):
+        """Check if an exception should never be retried"""
+        return POLICIES[self.classify(error)].retries == 0
+
+    def check(self, video_id):
+        """Raise KnownFailure if a video failed permanently within the TTL"""
+        reason = self.negative_cache.get(video_id)
+        if reason is not None:
+            raise KnownFailure(f"Skipped, this video failed recently: {reason}")
+
+    def record(self, video_id, error):
+        """
+        Count a failure and remember videos that will keep failing
+
+        Returns:
+            The error class
+        """
+        error_class = self.classify(error)
+        self.failures[error_class] += 1
+        if error_class == 'unavailable' and not isinstance(error, KnownFailure):
+            self.negative_cache.set(video_id, str(error)[:200])
+        return error_class
+
+    async def run(self, func):
+        """
+        Run a coroutine function, retrying transient failures with backoff
+
+        Args:
+            func: Coroutine function without arguments
+
+        Returns:
+            The return value of func
+        """
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                policy = POLICIES[self.classify(e)]
+                if attempt >= policy.retries:
+                    raise
+                delay = policy.delay(attempt)
+                attempt += 1
+                logger.warning(f"Attempt {attempt} failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    def skip_delay(self, failures):
+        """Backoff before trying the next song after consecutive failures"""
+        return min(Config.RETRY_BASE_DELAY * 2 ** (failures - 1), 30.0)
+
+    def stats(self):
+        """Get failure counts per error class and the negative cache size"""
+        return {'failures': dict(self.failures), 'known_bad': self.negative_cache.stats()['size']}
+
+# Shared scheduler used by the YouTube helpers and playback
+failure_scheduler = FailureScheduler()
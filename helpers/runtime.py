@@ -0,0 +1,206 @@
+import json
+import time
+import asyncio
+import logging
+import importlib
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Third-party modules behind the bot, slow to import, preloaded by warm_up(): these
+# in a thread, and Pyrogram on the event loop, as it binds to the loop it is imported on
+THREAD_MODULES = ("pytgcalls", "pytgcalls.types", "yt_dlp")
+LOOP_MODULES = ("pyrogram", "pyrogram.types")
+
+class BotRuntime:
+    """
+    Run the bot on the current event loop and publish its live state
+
+    The control API shares the loop, so it reads the state directly
+    instead of through globals set from another thread.
+    """
+
+    def __init__(self, interval=None):
+        """
+        Args:
+            interval: Seconds between state pushes to subscribers
+        """
+        self.interval = interval or Config.DASHBOARD_INTERVAL
+        # stopped, starting, running or failed
+        self.status = "stopped"
+        self.error = None
+        self._task = None
+        self._stop = None
+        self._state = None
+        self._subscribers = set()
+        self._publisher = None
+        self._warmup = None
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    def start(self):
+        """
+        Start the bot in the background unless it already runs
+
+        Returns:
+            'starting', or 'already_running' if it was started before
+        """
+        if self._task is not None and not self._task.done():
+            return "already_running" if self.running else "starting"
+        self._stop = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        return "starting"
+
+    def warm_up(self):
+        """Start importing the bot's heavy dependencies in the background"""
+        if self._warmup is None:
+            self._warmup = asyncio.ensure_future(self._preload())
+
+    async def _preload(self):
+        """
+        Import THREAD_MODULES in a thread, so the event loop keeps serving
+        meanwhile, then LOOP_MODULES on the loop itself
+
+        The bot module is imported on the loop by _run(), as its Pyrogram
+        client binds to the event loop it is created on.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        loaded = []
+        for name in THREAD_MODULES + LOOP_MODULES:
+            try:
+                if name in THREAD_MODULES:
+                    await loop.run_in_executor(None, importlib.import_module, name)
+                else:
+                    importlib.import_module(name)
+                loaded.append(name)
+            except Exception as e:
+                # Reported again when the bot is started
+                logger.warning(f"Could not preload {name}: {e}")
+        logger.info(f"Preloaded {', '.join(loaded) or 'nothing'} in {time.perf_counter() - started:.2f}s")
+
+    async def stop(self):
+        """Stop the bot and wait for its clients to shut down"""
+        if self._task is None or self._task.done():
+            return
+        self._stop.set()
+        await self._task
+
+    async def _run(self):
+        """Start the bot and assistant clients and keep them up until stopped"""
+        self._set_status("starting")
+        if self._warmup is not None:
+            # Importing a module the warmup thread is still loading would block the loop
+            await self._warmup
+        try:
+            # Imported here so the control API answers before the Telegram stack is loaded
+            from bot import (
+                bot, assistants, start_pytgcalls, recover_queues, queue_manager,
+                start_workers, stop_workers, dashboard_state,
+            )
+            from helpers.executor import ytdl_executor
+            from helpers.ytdl_pool import ytdl_pool
+            from helpers.watchdog import watchdog
+        except Exception as e:
+            logger.error(f"Error loading the bot: {e}")
+            self.error = str(e)
+            self._set_status("failed")
+            return
+
+        self._state = dashboard_state
+        try:
+            await bot.start()
+            logger.info("Bot started successfully!")
+
+            if Config.WORKER_PROCESSES > 1:
+                # Playback runs in worker processes, this one only receives updates
+                start_workers()
+                logger.info(f"Started {Config.WORKER_PROCESSES} worker processes")
+            else:
+                await assistants.start()
+                logger.info(f"{len(assistants)} assistant clients started successfully!")
+
+                # Start PyTgCalls client
+                await start_pytgcalls()
+
+                # Pre-create pooled YoutubeDL instances off the event loop
+                await ytdl_executor.run('search', ytdl_pool.warm)
+
+                # Reload saved queues, their voice chats are rejoined in the background
+                await recover_queues()
+
+            # Watch the event loop for lag, stalls and slow handlers
+            watchdog.start()
+            self._set_status("running")
+
+            await self._stop.wait()
+            self._set_status("stopped")
+        except Exception as e:
+            logger.error(f"Error starting clients: {e}")
+            self.error = str(e)
+            self._set_status("failed")
+        finally:
+            # Ensure clients are properly stopped
+            watchdog.stop()
+            stop_workers()
+            await bot.stop()
+            await assistants.stop()
+            if queue_manager.store is not None:
+                queue_manager.store.close()
+
+    def _set_status(self, status):
+        self.status = status
+        if status != "failed":
+            self.error = None
+        # Subscribers hear about status changes at once
+        self._publish()
+
+    def snapshot(self):
+        """Get the runtime status and, while the bot runs, its live state"""
+        state = {'status': self.status, 'running': self.running, 'error': self.error}
+        if self._state is not None and self.status in ("starting", "running"):
+            state.update(self._state())
+        return state
+
+    async def subscribe(self):
+        """
+        Yield the serialized state whenever it is published
+
+        A slow subscriber only ever gets the latest state, never a backlog.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._publisher is None:
+            self._publisher = asyncio.ensure_future(self._publish_forever())
+        try:
+            queue.put_nowait(json.dumps(self.snapshot(), default=str))
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+    def _publish(self):
+        """Serialize the state once and hand it to every subscriber"""
+        if not self._subscribers:
+            return
+        data = json.dumps(self.snapshot(), default=str)
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _publish_forever(self):
+        """Push the state every interval while anyone is subscribed"""
+        try:
+            while self._subscribers:
+                await asyncio.sleep(self.interval)
+                self._publish()
+        finally:
+            self._publisher = None
+
+# Runtime of this process
+runtime = BotRuntime()
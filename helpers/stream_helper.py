@@ -12,95 +12,139 @@ class NoActiveGroupCall(Exception):
 class GroupCallNotFound(Exception):
     pass
 
-from helpers.youtube import get_youtube_stream
+from helpers.youtube import get_stream_source
+from helpers.audio_cache import audio_cache
+from helpers.assistants import AssistantPool
+from helpers.loudness import ensure_analyzed, volume_parameters
+from helpers.metrics import timed, stream_call_seconds, stream_call_errors
+from helpers.tracing import traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def start_stream(call_py: PyTgCalls, chat_id: int, file_path: str):
+# File currently streaming in each chat, pinned so the audio cache keeps it
+streaming_files = {}
+
+def _set_streaming_file(chat_id: int, file_path):
+    """Pin the file now streaming in a chat and unpin the previous one"""
+    previous = streaming_files.pop(chat_id, None)
+    if previous:
+        audio_cache.release(previous)
+    # Direct stream URLs are not in the cache and need no pin
+    if file_path and not file_path.startswith(("http://", "https://")):
+        audio_cache.acquire(file_path)
+        streaming_files[chat_id] = file_path
+        # Files cached before normalization existed get their gain for next time
+        ensure_analyzed(os.path.splitext(os.path.basename(file_path))[0], file_path)
+
+def _media_stream(file_path):
+    """Build the MediaStream for a file, applying its stored loudness correction"""
+    return MediaStream(
+        file_path,
+        audio_parameters=AudioQuality.HIGH,
+        ffmpeg_parameters=volume_parameters(file_path),
+    )
+
+@traced()
+@timed(stream_call_seconds, stream_call_errors, "start_stream")
+async def start_stream(assistants: AssistantPool, chat_id: int, file_path: str):
     """
     Start streaming an audio file in a voice chat
     
     Args:
-        call_py: PyTgCalls client
+        assistants: Assistant pool, the assistant serving the chat is used
         chat_id: ID of the chat
-        file_path: Path to the audio file
+        file_path: Path to the audio file or a direct media URL
     """
+    call_py = assistants.for_chat(chat_id)
     try:
         await call_py.join_group_call(
             chat_id,
-            MediaStream(
-                file_path,
-                audio_parameters=AudioQuality.HIGH,
-            )
+            _media_stream(file_path)
         )
+        _set_streaming_file(chat_id, file_path)
         logger.info(f"Started streaming in chat {chat_id}")
     except Exception as e:
         logger.error(f"Error joining group call: {e}")
+        # Not in a call, so the chat isn't using the assistant
+        assistants.release(chat_id)
         if "no active group call" in str(e).lower():
-            raise Exception("No active group call found. Please start a voice chat first.")
+            raise Exception("No active group call found. Please start a voice chat first.") from e
         else:
-            raise Exception(f"Failed to join voice chat: {str(e)}")
+            raise Exception(f"Failed to join voice chat: {str(e)}") from e
 
-async def change_stream(call_py: PyTgCalls, chat_id: int, url: str):
+@traced()
+@timed(stream_call_seconds, stream_call_errors, "change_stream")
+async def change_stream(assistants: AssistantPool, chat_id: int, url: str):
     """
     Change the current stream to a new song
     
     Args:
-        call_py: PyTgCalls client
+        assistants: Assistant pool, the assistant serving the chat is used
         chat_id: ID of the chat
         url: YouTube URL of the new song
     """
+    call_py = assistants.for_chat(chat_id)
     try:
         # Get the audio stream from YouTube
-        file_path = await get_youtube_stream(url)
+        file_path = await get_stream_source(url)
         
         # Change the stream
         await call_py.change_stream(
             chat_id,
-            MediaStream(
-                file_path,
-                audio_parameters=AudioQuality.HIGH,
-            )
+            _media_stream(file_path)
         )
+        _set_streaming_file(chat_id, file_path)
         logger.info(f"Changed stream in chat {chat_id}")
     except Exception as e:
         logger.error(f"Error changing stream: {e}")
         # If changing stream fails, try to restart the stream
         try:
-            await leave_call(call_py, chat_id)
+            await leave_call(assistants, chat_id)
             await asyncio.sleep(1)
-            await start_stream(call_py, chat_id, file_path)
+            await start_stream(assistants, chat_id, file_path)
         except Exception as inner_e:
             logger.error(f"Error restarting stream: {inner_e}")
-            raise Exception(f"Failed to change stream: {str(e)}")
+            raise Exception(f"Failed to change stream: {str(e)}") from e
 
-async def leave_call(call_py: PyTgCalls, chat_id: int):
+@timed(stream_call_seconds, stream_call_errors, "leave_call")
+async def leave_call(assistants: AssistantPool, chat_id: int):
     """
     Leave the voice chat
     
     Args:
-        call_py: PyTgCalls client
+        assistants: Assistant pool, the assistant serving the chat is used
         chat_id: ID of the chat
     """
+    call_py = assistants.serving(chat_id)
+    _set_streaming_file(chat_id, None)
+    if call_py is None:
+        # No assistant joined a call in this chat
+        return
     try:
         await call_py.leave_group_call(chat_id)
+        assistants.release(chat_id)
         logger.info(f"Left voice chat in {chat_id}")
     except Exception as e:
         logger.error(f"Error leaving group call: {e}")
         # Don't raise an exception if we're already not in the call
         if not ("no active group call" in str(e).lower() or "group call not found" in str(e).lower()):
             raise Exception(f"Failed to leave voice chat: {str(e)}")
+        assistants.release(chat_id)
 
-async def pause_stream(call_py: PyTgCalls, chat_id: int):
+@timed(stream_call_seconds, stream_call_errors, "pause_stream")
+async def pause_stream(assistants: AssistantPool, chat_id: int):
     """
     Pause the current stream
     
     Args:
-        call_py: PyTgCalls client
+        assistants: Assistant pool, the assistant serving the chat is used
         chat_id: ID of the chat
     """
+    call_py = assistants.serving(chat_id)
+    if call_py is None:
+        raise NoActiveGroupCall("No active group call")
     try:
         await call_py.pause_stream(chat_id)
         logger.info(f"Paused stream in chat {chat_id}")
@@ -108,14 +152,18 @@ async def pause_stream(call_py: PyTgCalls, chat_id: int):
         logger.error(f"Error pausing stream: {e}")
         raise Exception(f"Failed to pause stream: {str(e)}")
 
-async def resume_stream(call_py: PyTgCalls, chat_id: int):
+@timed(stream_call_seconds, stream_call_errors, "resume_stream")
+async def resume_stream(assistants: AssistantPool, chat_id: int):
     """
     Resume the paused stream
     
     Args:
-        call_py: PyTgCalls client
+        assistants: Assistant pool, the assistant serving the chat is used
         chat_id: ID of the chat
     """
+    call_py = assistants.serving(chat_id)
+    if call_py is None:
+        raise NoActiveGroupCall("No active group call")
     try:
         await call_py.resume_stream(chat_id)
         logger.info(f"Resumed stream in chat {chat_id}")
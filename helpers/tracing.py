@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Span of the code running right now, follows tasks created inside it
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "started", "duration", "attributes", "error")
+
+    def __init__(self, name, parent, attributes):
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.attributes = attributes
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration': round(self.duration, 6) if self.duration is not None else None,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+class Tracer:
+    """Record timed spans of the /play pipeline into a ring buffer"""
+
+    def __init__(self, enabled=Config.TRACING, buffer_size=Config.TRACE_BUFFER_SIZE,
+                 export_path=Config.TRACE_EXPORT_PATH):
+        """
+        Args:
+            enabled: Record spans at all
+            buffer_size: Finished spans kept in memory
+            export_path: Optional file every finished span is appended to as a JSON line
+        """
+        self.enabled = enabled
+        self.spans = deque(maxlen=buffer_size)
+        self.export_path = export_path
+        self._export_file = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, root=False, **attributes):
+        """
+        Time a block as a span
+
+        Args:
+            name: Span name
+            root: Start a new trace; otherwise the span is only recorded
+                inside an existing trace
+            **attributes: Initial span attributes
+        """
+        parent = _current_span.get()
+        if not self.enabled or (parent is None and not root):
+            yield None
+            return
+        
+        span = Span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration = time.perf_counter() - span.started
+            self._finish(span)
+
+    def annotate(self, **attributes):
+        """Add attributes to the current span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if self.export_path:
+            try:
+                if self._export_file is None:
+                    self._export_file = open(self.export_path, "a", buffering=1)
+                self._export_file.write(json.dumps(span.to_dict(), default=str) + "\n")
+            except OSError as e:
+                logger.error(f"Error exporting span: {e}")
+                self.export_path = ""
+
+    def recent_traces(self, limit=20):
+        """
+        Get the latest traces with their spans
+
+        Returns:
+            List of traces, newest first, each a dict with its root name, duration and spans
+        """
+        with self._lock:
+            spans = list(self.spans)
+        traces = {}
+        for span in spans:
+            traces.setdefault(span.trace_id, []).append(span)
+        
+        result = []
+        for trace_id in reversed(list(traces)):
+            trace_spans = sorted(traces[trace_id], key=lambda span: span.started)
+            root = next((span for span in trace_spans if span.parent_id is None), None)
+            result.append({
+                'trace_id': trace_id,
+                'name': root.name if root else None,
+                'duration': round(root.duration, 6) if root else None,
+                'spans': [span.to_dict() for span in trace_spans],
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+    def summary(self):
+        """Get count and p50/p95/p99/max duration per span name"""
+        with self._lock:
+            spans = list(self.spans)
+        durations = {}
+        for span in spans:
+            durations.setdefault(span.name, []).append(span.duration)
+        
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'p50': round(_percentile(values, 0.5), 4),
+                'p95': round(_percentile(values, 0.95), 4),
+                'p99': round(_percentile(values, 0.99), 4),
+                'max': round(values[-1], 4),
+            }
+        return summary
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Shared tracer
+tracer = Tracer()
+
+def detached(coro):
+    """
+    Schedule a coroutine as a task outside the current trace
+
+    For background work that may outlive the span starting it, which would
+    otherwise get its spans, possibly after that trace has finished.
+    """
+    return asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+
+def traced(name=None, root=False):
+    """Decorator running a coroutine function inside a span"""
+    def decorator(func):
+        span_name = name or func.__name__
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(span_name, root=root):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,176 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import itertools
+import subprocess
+from collections import deque
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job priorities, lower runs first
+PRIORITY_PLAY = 0
+PRIORITY_PREFETCH = 10
+PRIORITY_BACKGROUND = 20
+
+class TranscodeError(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("command", "key", "priority", "future", "loop", "started", "cancelled")
+
+    def __init__(self, command, key, priority, future, loop):
+        self.command = command
+        self.key = key
+        self.priority = priority
+        self.future = future
+        self.loop = loop
+        self.started = False
+        self.cancelled = False
+
+class Transcoder:
+    """Fixed-size pool of ffmpeg processes fed from a priority queue"""
+
+    def __init__(self, workers=None):
+        """
+        Initialize the transcoder
+
+        Args:
+            workers: Maximum number of ffmpeg processes running at once
+        """
+        self.workers = workers or Config.TRANSCODE_WORKERS
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._threads = []
+        self._queued = {}
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.cpu_seconds = 0.0
+        # Most recent jobs for sizing hosts: (key, cpu seconds, wall seconds)
+        self.recent = deque(maxlen=50)
+
+    def _start_threads(self):
+        """Start the worker threads on first use"""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work, name=f"transcode-{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    async def run(self, command, priority=PRIORITY_PLAY, key=None):
+        """
+        Run an ffmpeg command once a pool slot is free
+
+        Args:
+            command: Argument list for the process
+            priority: Job priority, lower runs first
+            key: Optional key so a queued job can be promoted later
+
+        Returns:
+            Dictionary with the stderr output, CPU time and wall time of the job
+        """
+        self._start_threads()
+        loop = asyncio.get_running_loop()
+        job = _Job(command, key, priority, loop.create_future(), loop)
+        with self._lock:
+            self._waiting += 1
+            if key is not None:
+                self._queued[key] = job
+        self._queue.put((priority, next(self._counter), job))
+
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            job.cancelled = True
+            raise
+
+    def promote(self, key, priority):
+        """Move a queued job ahead if a more urgent caller now waits for it"""
+        with self._lock:
+            job = self._queued.get(key)
+            if job is None or job.started or priority >= job.priority:
+                return
+            job.priority = priority
+        # The old entry stays in the queue and is skipped once the job has started
+        self._queue.put((priority, next(self._counter), job))
+
+    def _work(self):
+        """Worker thread: run one ffmpeg process at a time"""
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                if job.started:
+                    continue
+                job.started = True
+                self._waiting -= 1
+                if job.key is not None:
+                    self._queued.pop(job.key, None)
+            if job.cancelled:
+                continue
+
+            try:
+                result = self._execute(job)
+                job.loop.call_soon_threadsafe(_resolve, job.future, result, None)
+            except Exception as e:
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, e)
+
+    def _execute(self, job):
+        """Run a process and measure its CPU time from its own resource usage"""
+        command = job.command
+        started = time.monotonic()
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+
+        # wait4 reports the resource usage of exactly this child
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu_time = usage.ru_utime + usage.ru_stime
+        wall_time = time.monotonic() - started
+
+        with self._lock:
+            self.cpu_seconds += cpu_time
+            if process.returncode == 0:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.recent.append((job.key or command[0], round(cpu_time, 3), round(wall_time, 3)))
+        logger.info(f"{command[0]} job took {cpu_time:.2f}s CPU, {wall_time:.2f}s wall")
+
+        if process.returncode != 0:
+            raise TranscodeError(f"{command[0]} exited with code {process.returncode}: {stderr.strip()[-300:]}")
+        return {'stderr': stderr, 'cpu_time': cpu_time, 'wall_time': wall_time}
+
+    def stats(self):
+        """Get queue depth, job counts and CPU time"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self._waiting,
+                'completed': self.completed,
+                'failed': self.failed,
+                'cpu_seconds': round(self.cpu_seconds, 3),
+                'recent': list(self.recent),
+            }
+
+def _resolve(future, result, error):
+    """Complete a job's future on its event loop"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+# Shared transcoder for audio preparation
+transcoder = Transcoder()
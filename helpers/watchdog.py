@@ -0,0 +1,134 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from config import Config
+from helpers.metrics import handlers_in_flight, loop_lag_seconds, loop_stalls, slow_handlers
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _await_stack(task):
+    """Stack of a suspended task, following the chain of awaited coroutines down to the innermost"""
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return traceback.StackSummary.extract(frames)
+
+class LoopWatchdog:
+    """Reports event loop lag, blocked loops and handlers that run too long"""
+
+    def __init__(self, threshold=Config.WATCHDOG_THRESHOLD, interval=Config.WATCHDOG_INTERVAL,
+                 handler_threshold=Config.WATCHDOG_HANDLER_THRESHOLD):
+        """
+        Args:
+            threshold: Seconds the loop may stay blocked before it is reported
+            interval: Seconds between heartbeats on the event loop
+            handler_threshold: Seconds a handler may run, awaits included, before it is reported
+        """
+        self.threshold = threshold
+        self.handler_threshold = handler_threshold
+        self.interval = interval
+        self.loop_thread_id = None
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.slow_handlers = 0
+        # Latest offenders with their stacks, shown by stats()
+        self.recent = deque(maxlen=20)
+        self._beat = 0.0
+        self._stall_reported = False
+        self._reported_handlers = set()
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start watching the running event loop, call from a coroutine on it"""
+        if self._task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        # The thread still runs while the loop is blocked, so it can catch the culprit
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        logger.info(f"Watchdog started (stalls over {self.threshold}s, handlers over {self.handler_threshold}s)")
+
+    def stop(self):
+        """Stop the heartbeat and the watching thread"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        """Measure scheduling lag and look for slow handlers, on the loop"""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            lag = max(0.0, self._beat - started - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag_seconds.set(lag)
+            self._check_handlers()
+
+    def _check_handlers(self):
+        """Report handlers that are still running past the threshold, once each"""
+        now = time.monotonic()
+        running = dict(handlers_in_flight)
+        self._reported_handlers &= running.keys()
+        for handler_id, (name, started, task) in running.items():
+            if handler_id in self._reported_handlers or now - started < self.handler_threshold:
+                continue
+            self._reported_handlers.add(handler_id)
+            stack = "".join(traceback.format_list(_await_stack(task))) if task is not None else ""
+            self._report("slow_handler", name, now - started, stack)
+            slow_handlers.inc(1, name)
+            self.slow_handlers += 1
+
+    def _watch(self):
+        """Catch the loop thread while it is blocked, from a separate thread"""
+        while not self._stopped.wait(self.interval):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold:
+                self._stall_reported = False
+                continue
+            if self._stall_reported:
+                continue
+            self._stall_reported = True
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            running = ", ".join(name for name, _, _ in list(handlers_in_flight.values())) or "none"
+            self._report("loop_stall", f"handlers running: {running}", blocked, stack)
+            loop_stalls.inc()
+            self.stalls += 1
+
+    def _report(self, kind, name, seconds, stack):
+        """Log an offender with its stack and keep it for stats()"""
+        logger.warning(f"Watchdog: {kind} ({name}) for {seconds:.2f}s\n{stack}")
+        self.recent.append({
+            'kind': kind,
+            'name': name,
+            'seconds': round(seconds, 3),
+            'stack': stack,
+        })
+
+    def stats(self):
+        """Get lag, stall and slow handler counters with the latest offenders"""
+        return {
+            'max_lag': round(self.max_lag, 3),
+            'stalls': self.stalls,
+            'slow_handlers': self.slow_handlers,
+            'recent': list(self.recent),
+        }
+
+# Shared watchdog for the bot's event loop
+watchdog = LoopWatchdog()
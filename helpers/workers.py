@@ -0,0 +1,117 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for crashed workers
+MONITOR_INTERVAL = 5
+
+def owner_of(chat_id, count):
+    """Get the index of the worker that owns a chat"""
+    return chat_id % count
+
+class WorkerSupervisor:
+    """Spawn worker processes that each own a shard of chats and route commands to them"""
+
+    def __init__(self, count=None):
+        """
+        Initialize the supervisor
+
+        Args:
+            count: Number of worker processes
+        """
+        self.count = count or Config.WORKER_PROCESSES
+        if len(Config.SESSION_STRINGS) < self.count:
+            raise ValueError(
+                f"{self.count} worker processes need at least as many session strings "
+                f"(got {len(Config.SESSION_STRINGS)})"
+            )
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue() for _ in range(self.count)]
+        self.processes = [None] * self.count
+        self.restarts = 0
+        self._monitor = None
+
+    def start(self):
+        """Start every worker and watch for crashes"""
+        for index in range(self.count):
+            self._spawn(index)
+        self._monitor = asyncio.ensure_future(self._watch())
+
+    def _spawn(self, index):
+        """Start one worker process"""
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.count, self.queues[index]),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        # Spawned children copy the environment, so Config is sharded before any import
+        os.environ["WORKER_INDEX"] = str(index)
+        try:
+            process.start()
+        finally:
+            del os.environ["WORKER_INDEX"]
+        self.processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    async def _watch(self):
+        """Restart workers that died"""
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def route(self, handler_name, message):
+        """
+        Send a command to the worker that owns the chat
+
+        Args:
+            handler_name: Name of the bot handler to run
+            message: Pyrogram message that triggered the command
+        """
+        index = owner_of(message.chat.id, self.count)
+        self.queues[index].put((handler_name, message.chat.id, message.id, message.command))
+
+    def stop(self, timeout=10):
+        """Ask every worker to stop and wait for them"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def stats(self):
+        """Get the state of every worker"""
+        return {
+            'workers': [
+                {'index': index, 'pid': process.pid, 'alive': process.is_alive()}
+                for index, process in enumerate(self.processes) if process is not None
+            ],
+            'restarts': self.restarts,
+        }
+
+def worker_main(index, count, commands):
+    """Entry point of a worker process"""
+    os.environ["WORKER_INDEX"] = str(index)
+    os.environ["WORKER_PROCESSES"] = str(count)
+
+    # Imported here so the bot and its clients are built for this worker's shard
+    from bot import run_worker
+    try:
+        asyncio.run(run_worker(commands))
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,20 @@
 import os
 import re
+import time
 import uuid
+import shutil
+import asyncio
 import logging
-import yt_dlp
 from config import Config
+from helpers.executor import ytdl_executor, raise_if_cancelled
+from helpers.ytdl_pool import ytdl_pool
+from helpers.cache import TTLCache, normalize_query
+from helpers.audio_cache import audio_cache, TEMP_PREFIX
+from helpers.retry import failure_scheduler
+from helpers.transcoder import transcoder, PRIORITY_PLAY
+from helpers.loudness import ensure_analyzed
+from helpers.metrics import search_seconds, download_seconds, download_bytes
+from helpers.tracing import tracer, traced, detached
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,81 +34,152 @@ ytdl_opts = {
     'default_search': 'auto',
     'source_address': '0.0.0.0',
     'extract_flat': 'in_playlist',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',
-    }],
 }
 
+# Options for flat searches
+search_opts = {
+    'quiet': True,
+    'no_warnings': True,
+    'noplaylist': True,
+    'source_address': '0.0.0.0',
+    'extract_flat': 'in_playlist'
+}
+
+# Audio-only formats PyTgCalls can read without a transcode, best first
+DIRECT_STREAM_FORMAT = 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio'
+
+# Reusable YoutubeDL instances, one profile per kind of job
+ytdl_pool.register('search', search_opts)
+ytdl_pool.register('metadata', ytdl_opts)
+ytdl_pool.register('stream', {
+    'format': DIRECT_STREAM_FORMAT,
+    'quiet': True,
+    'no_warnings': True,
+    'noplaylist': True,
+    'source_address': '0.0.0.0',
+})
+ytdl_pool.register('download', dict(
+    ytdl_opts,
+    # Relative to the per-job 'paths' home set in _download_audio_sync
+    outtmpl="%(id)s.%(ext)s",
+    # Lets a timed out or cancelled job abort the download between chunks
+    progress_hooks=[lambda _: raise_if_cancelled()],
+))
+
+# Caches for search results (query -> results) and metadata (video ID -> info)
+search_cache = TTLCache(
+    "search", Config.SEARCH_CACHE_SIZE, Config.SEARCH_CACHE_TTL, Config.CACHE_DB_PATH
+)
+metadata_cache = TTLCache(
+    "metadata", Config.METADATA_CACHE_SIZE, Config.METADATA_CACHE_TTL, Config.CACHE_DB_PATH
+)
+
+# Resolved media URLs (video ID -> URL), kept well below YouTube's signature expiry
+stream_url_cache = TTLCache("stream_url", Config.METADATA_CACHE_SIZE, Config.STREAM_URL_TTL)
+
 # Function to search for YouTube videos
-async def search_youtube(query):
+@traced()
+async def search_youtube(query, limit=5):
     """
     Search for videos on YouTube
     
+    Results are built from the flat search entries alone, so a search costs a
+    single round trip. Use get_video_info for full metadata of one video.
+    
     Args:
         query: Search query, can be a video URL or search terms
+        limit: Maximum number of results (1 = first hit only, used by /play)
         
     Returns:
         List of dictionaries with video information
     """
+    started = time.perf_counter()
+    
     # If query is a valid YouTube URL, get info directly
     if re.match(r"^(https?\:\/\/)?(www\.youtube\.com|youtu\.?be)\/.+$", query):
         video_id = extract_video_id(query)
         if video_id:
-            with yt_dlp.YoutubeDL(ytdl_opts) as ydl:
-                try:
-                    info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-                    return [{
-                        'id': info['id'],
-                        'title': info['title'],
-                        'duration': format_duration(info.get('duration', 0)),
-                        'thumbnail': info.get('thumbnail', '')
-                    }]
-                except Exception as e:
-                    logger.error(f"Error extracting video info: {e}")
-                    return []
-    
-    # Otherwise search YouTube
-    search_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'default_search': 'ytsearch5',  # Get top 5 results
-        'noplaylist': True,
-        'source_address': '0.0.0.0',
-        'extract_flat': 'in_playlist'
-    }
+            info = await get_video_info(video_id)
+            search_seconds.observe(time.perf_counter() - started, "url")
+            tracer.annotate(cache="url")
+            return [info] if info else []
+    
+    # Otherwise search YouTube, unless the same query was answered recently
+    cache_key = f"{limit}:{normalize_query(query)}"
+    results = search_cache.get(cache_key)
+    if results is not None:
+        search_seconds.observe(time.perf_counter() - started, "hit")
+        tracer.annotate(cache="hit")
+        return results
+    tracer.annotate(cache="miss")
     
     try:
-        with yt_dlp.YoutubeDL(search_opts) as ydl:
-            info = ydl.extract_info(f"ytsearch5:{query}", download=False)
-            results = info.get('entries', [])
-            
-            formatted_results = []
-            for result in results:
-                if not result:
-                    continue
-                
-                # For search results, we need to get full info for each video
-                try:
-                    video_info = ydl.extract_info(
-                        f"https://www.youtube.com/watch?v={result['id']}", 
-                        download=False
-                    )
-                    formatted_results.append({
-                        'id': video_info['id'],
-                        'title': video_info['title'],
-                        'duration': format_duration(video_info.get('duration', 0)),
-                        'thumbnail': video_info.get('thumbnail', '')
-                    })
-                except Exception as e:
-                    logger.error(f"Error getting full video info: {e}")
-                    continue
-            
-            return formatted_results
+        results = await ytdl_executor.run('search', _search_youtube_sync, query, limit)
     except Exception as e:
         logger.error(f"Error searching YouTube: {e}")
         return []
+    finally:
+        search_seconds.observe(time.perf_counter() - started, "miss")
+    
+    if results:
+        search_cache.set(cache_key, results)
+    return results
+
+def _search_youtube_sync(query, limit):
+    """Blocking part of search_youtube, runs in the search pool"""
+    with ytdl_pool.checkout('search') as ydl:
+        info = ydl.extract_info(f"ytsearch{limit}:{query}", download=False)
+        results = info.get('entries', [])
+        
+        # Flat entries already carry title, duration and thumbnails
+        return [format_entry(result) for result in results if result and result.get('id')]
+
+# Function to get full metadata for a single video
+@traced()
+async def get_video_info(video_id):
+    """
+    Get full metadata for a single video
+    
+    Args:
+        video_id: YouTube video ID
+        
+    Returns:
+        Dictionary with video information, or None on error
+    """
+    info = metadata_cache.get(video_id)
+    tracer.annotate(cache="hit" if info is not None else "miss")
+    if info is not None:
+        return info
+    
+    try:
+        info = await ytdl_executor.run('search', _get_video_info_sync, video_id)
+    except Exception as e:
+        logger.error(f"Error extracting video info: {e}")
+        return None
+    
+    metadata_cache.set(video_id, info)
+    return info
+
+def _get_video_info_sync(video_id):
+    """Blocking part of get_video_info, runs in the search pool"""
+    with ytdl_pool.checkout('metadata') as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        return format_entry(info)
+
+# Function to format a yt-dlp info dict or flat search entry
+def format_entry(info):
+    """Format a yt-dlp info dict or flat search entry into a result dictionary"""
+    thumbnail = info.get('thumbnail')
+    if not thumbnail and info.get('thumbnails'):
+        # Flat entries list thumbnails from smallest to largest
+        thumbnail = info['thumbnails'][-1].get('url')
+    
+    return {
+        'id': info['id'],
+        'title': info.get('title') or info['id'],
+        'duration': format_duration(info.get('duration', 0)),
+        'thumbnail': thumbnail or f"https://i.ytimg.com/vi/{info['id']}/hqdefault.jpg"
+    }
 
 # Function to extract the YouTube video ID from a URL
 def extract_video_id(url):
@@ -128,13 +210,20 @@ def format_duration(duration_seconds):
     else:
         return f"{minutes:02}:{seconds:02}"
 
+# Downloads in progress, keyed by video ID and shared by every caller
+_inflight_downloads = {}
+
 # Function to download and process YouTube audio
-async def get_youtube_stream(url):
+@traced()
+async def get_youtube_stream(url, priority=PRIORITY_PLAY):
     """
     Download and process audio from YouTube video
     
+    Concurrent calls for the same video share a single download.
+    
     Args:
         url: YouTube video URL
+        priority: Transcode priority (PRIORITY_PLAY for songs about to play)
         
     Returns:
         Path to the downloaded audio file
@@ -143,17 +232,156 @@ async def get_youtube_stream(url):
     if not video_id:
         raise ValueError("Invalid YouTube URL")
     
-    output_path = f"{Config.TEMP_DOWNLOAD_DIRECTORY}{video_id}.mp3"
+    # Check the audio cache again, another caller may have finished the download since
+    # get_stream_source looked; only that first lookup counts towards the hit ratio
+    cached_path = audio_cache.lookup(video_id, count=False)
+    tracer.annotate(video_id=video_id, cache="hit" if cached_path else "miss")
+    if cached_path:
+        return cached_path
+    
+    # Join a download that is already running for this video
+    future = _inflight_downloads.get(video_id)
+    tracer.annotate(joined=future is not None)
+    if future is None:
+        # Shared by later callers, so traced on its own rather than in this trace
+        future = detached(_download_audio(url, video_id, priority))
+        _inflight_downloads[video_id] = future
+        future.add_done_callback(lambda _: _inflight_downloads.pop(video_id, None))
+    else:
+        # A prefetch may be waiting for a transcode slot while this song is about to play
+        transcoder.promote(video_id, priority)
+    
+    # Shielded so one caller giving up does not cancel it for the others
+    return await asyncio.shield(future)
+
+@traced("download", root=True)
+async def _download_audio(url, video_id, priority):
+    """Download into a private temp directory and move the file into the cache atomically"""
+    temp_dir = os.path.join(Config.TEMP_DOWNLOAD_DIRECTORY, f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+    started = time.perf_counter()
     
-    # Check if file already exists to avoid re-downloading
-    if os.path.isfile(output_path):
+    # Download the audio in the download pool
+    try:
+        with tracer.span("ytdl_download"):
+            temp_path = await ytdl_executor.run('download', _download_audio_sync, url, temp_dir)
+        
+        # Re-encode in the transcoder pool unless the native stream is kept
+        if Config.AUDIO_CACHE_FORMAT == "mp3" and not temp_path.endswith(".mp3"):
+            temp_path = await transcode_to_mp3(temp_path, video_id, priority)
+        
+        # Keep whatever container the download ended up in (mp3, webm, m4a, ...)
+        extension = os.path.splitext(temp_path)[1]
+        output_path = f"{Config.TEMP_DOWNLOAD_DIRECTORY}{video_id}{extension}"
+        os.replace(temp_path, output_path)
+        audio_cache.add(video_id, output_path)
+        download_seconds.observe(time.perf_counter() - started)
+        download_bytes.inc(os.path.getsize(output_path))
+        tracer.annotate(bytes=os.path.getsize(output_path))
+        
+        # Measure loudness once, in the background, now that the song is cached
+        ensure_analyzed(video_id, output_path)
         return output_path
+    except Exception as e:
+        logger.error(f"Error downloading audio: {e}")
+        raise Exception(f"Failed to download audio: {str(e)}") from e
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _download_audio_sync(url, temp_dir):
+    """Blocking part of get_youtube_stream, runs in the download pool"""
+    with ytdl_pool.checkout('download') as ydl:
+        ydl.params['paths'] = {'home': temp_dir}
+        info = ydl.extract_info(url, download=True)
+        
+        # Final path of the requested download
+        downloads = info.get('requested_downloads') or []
+        if downloads and downloads[0].get('filepath'):
+            return downloads[0]['filepath']
+        return ydl.prepare_filename(info)
+
+# Function to re-encode a downloaded file to MP3
+@traced()
+async def transcode_to_mp3(path, video_id, priority):
+    """
+    Re-encode a downloaded file to 192k MP3 in the transcoder pool
+    
+    Returns:
+        Path to the MP3 file next to the original
+    """
+    output_path = os.path.splitext(path)[0] + ".mp3"
+    await transcoder.run(
+        ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", path,
+         "-vn", "-codec:a", "libmp3lame", "-b:a", "192k", output_path],
+        priority,
+        key=video_id,
+    )
+    os.remove(path)
+    return output_path
+
+# Function to get something PyTgCalls can play for a video
+@traced()
+async def get_stream_source(url, priority=PRIORITY_PLAY):
+    """
+    Get a playable source for a YouTube video
+    
+    A cached file is used when there is one. In direct stream mode the
+    best audio-only format URL is handed to PyTgCalls as is, skipping the
+    download and transcode; the download path stays as a fallback.
+    
+    Args:
+        url: YouTube video URL
+        priority: Transcode priority (PRIORITY_PLAY for songs about to play)
+        
+    Returns:
+        Path to an audio file or a media URL
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+    
+    cached_path = audio_cache.lookup(video_id)
+    tracer.annotate(video_id=video_id, cache="hit" if cached_path else "miss")
+    if cached_path:
+        return cached_path
     
-    # Download the audio
-    with yt_dlp.YoutubeDL(ytdl_opts) as ydl:
+    # Don't spend a download on a video that is known to fail
+    failure_scheduler.check(video_id)
+    
+    if Config.STREAM_MODE == "direct":
         try:
-            ydl.extract_info(url, download=True)
-            return output_path
+            return await resolve_audio_url(video_id)
         except Exception as e:
-            logger.error(f"Error downloading audio: {e}")
-            raise Exception(f"Failed to download audio: {str(e)}")
+            logger.warning(f"Error resolving direct stream for {video_id}, downloading instead: {e}")
+    
+    try:
+        return await get_youtube_stream(url, priority)
+    except Exception as e:
+        failure_scheduler.record(video_id, e)
+        raise
+
+# Function to resolve the media URL of the best audio-only format
+@traced()
+async def resolve_audio_url(video_id):
+    """
+    Resolve the media URL of the best audio-only format of a video
+    
+    Args:
+        video_id: YouTube video ID
+        
+    Returns:
+        Media URL of the audio stream
+    """
+    media_url = stream_url_cache.get(video_id)
+    tracer.annotate(cache="hit" if media_url is not None else "miss")
+    if media_url is None:
+        media_url = await ytdl_executor.run('search', _resolve_audio_url_sync, video_id)
+        stream_url_cache.set(video_id, media_url)
+    return media_url
+
+def _resolve_audio_url_sync(video_id):
+    """Blocking part of resolve_audio_url, runs in the search pool"""
+    with ytdl_pool.checkout('stream') as ydl:
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        if not info.get('url'):
+            raise Exception("No direct audio URL in the selected format")
+        return info['url']
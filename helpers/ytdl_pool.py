@@ -0,0 +1,77 @@
+import logging
+import threading
+from contextlib import contextmanager
+import yt_dlp
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class YoutubeDLPool:
+    """Long-lived YoutubeDL instances, one set per option profile"""
+
+    def __init__(self, max_uses=None):
+        """
+        Initialize the pool
+
+        Args:
+            max_uses: Jobs an instance serves before it is recycled
+        """
+        self.max_uses = max_uses or Config.YTDL_RECYCLE_AFTER
+        self.profiles = {}
+        # Idle instances per profile as [ydl, uses] pairs
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def register(self, name, opts):
+        """Register an option profile"""
+        self.profiles[name] = opts
+        self._idle.setdefault(name, [])
+
+    def warm(self, count=1):
+        """Pre-create instances for every profile so the first jobs skip initialization"""
+        for name in self.profiles:
+            instances = [self._create(name) for _ in range(count)]
+            with self._lock:
+                self._idle[name].extend(instances)
+
+    @contextmanager
+    def checkout(self, name):
+        """
+        Borrow an instance for one job
+
+        The instance is used by a single thread until it is returned.
+        Instances are recycled after max_uses jobs or when a job raises.
+        """
+        with self._lock:
+            item = self._idle[name].pop() if self._idle[name] else None
+        if item is None:
+            item = self._create(name)
+
+        ok = False
+        try:
+            yield item[0]
+            ok = True
+        finally:
+            item[1] += 1
+            if ok and item[1] < self.max_uses:
+                with self._lock:
+                    self._idle[name].append(item)
+            else:
+                item[0].close()
+
+    def _create(self, name):
+        """Create a fresh instance for a profile"""
+        self.created += 1
+        return [yt_dlp.YoutubeDL(dict(self.profiles[name])), 0]
+
+    def stats(self):
+        """Get the number of idle instances per profile"""
+        with self._lock:
+            idle = {name: len(items) for name, items in self._idle.items()}
+        return {'idle': idle, 'created': self.created}
+
+# Shared pool used by the YouTube helpers
+ytdl_pool = YoutubeDLPool()
@@ -1,11 +1,9 @@
 import logging
-import asyncio
-import threading
+import json
 import os
-from flask import Flask, render_template, request, jsonify
-from pyrogram import idle
-from bot import bot, user, start_pytgcalls
-from config import Config
+import jinja2
+from aiohttp import web
+from helpers.control import ControlClient, ServiceUnavailable, query_int
 
 # Configure logging
 logging.basicConfig(
@@ -14,80 +12,106 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "telegrammusicbot")
+# Templates rendered with Jinja, as before
+templates = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")),
+    autoescape=True,
+)
+
+# The bot runs in the service process (service.py), web workers only talk to it
+control = ControlClient()
+
+routes = web.RouteTableDef()
 
-# Global variable to track bot status
-bot_started = False
-bot_thread = None
+@routes.get('/healthz')
+async def healthz(request):
+    """Liveness check, answered by the web worker without asking the bot service"""
+    return web.json_response({"status": "ok"})
 
-async def run_bot():
-    """Main function to start both bot and user clients"""
-    global bot_started
+@routes.get('/')
+async def home(request):
+    """Render home page"""
     try:
-        await bot.start()
-        logger.info("Bot started successfully!")
-        
-        await user.start()
-        logger.info("User client started successfully!")
-        
-        # Start PyTgCalls client
-        await start_pytgcalls()
-        
-        # Update bot status
-        bot_started = True
-        
-        # Keep the script running
-        await idle()
-    except Exception as e:
-        logger.error(f"Error starting clients: {e}")
-        bot_started = False
-    finally:
-        # Ensure clients are properly stopped
-        await bot.stop()
-        await user.stop()
-        bot_started = False
-
-def start_bot_thread():
-    """Start the bot in a separate thread"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+        running = (await control.status())["running"]
+    except ServiceUnavailable:
+        running = False
+    html = templates.get_template('index.html').render(bot_status=running)
+    return web.Response(text=html, content_type="text/html")
+
+@routes.post('/start_bot')
+async def start_bot(request):
+    """Ask the bot service to start the Telegram bot"""
     try:
-        loop.run_until_complete(run_bot())
-    except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
-    finally:
-        loop.close()
-
-@app.route('/')
-def home():
-    """Render home page"""
-    global bot_started
-    return render_template('index.html', bot_status=bot_started)
-
-@app.route('/start_bot', methods=['POST'])
-def start_bot():
-    """Start the Telegram bot"""
-    global bot_started, bot_thread
-    
-    if not bot_started and (bot_thread is None or not bot_thread.is_alive()):
-        bot_thread = threading.Thread(target=start_bot_thread)
-        bot_thread.daemon = True
-        bot_thread.start()
-        return jsonify({"status": "starting"})
-    
-    return jsonify({"status": "already_running" if bot_started else "starting"})
-
-@app.route('/bot_status')
-def bot_status():
+        return web.json_response(await control.start())
+    except ServiceUnavailable as e:
+        return web.json_response({"status": "unavailable", "error": str(e)}, status=503)
+
+@routes.get('/bot_status')
+async def bot_status(request):
     """Get the current bot status"""
-    global bot_started
-    return jsonify({"running": bot_started})
+    try:
+        return web.json_response(await control.status())
+    except ServiceUnavailable as e:
+        return web.json_response({"running": False, "status": "unavailable", "error": str(e)}, status=503)
+
+@routes.get('/events')
+async def events(request):
+    """Stream the live bot state as Server-Sent Events"""
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+    try:
+        async for data in control.subscribe():
+            await response.write(f"data: {data}\n\n".encode())
+    except ConnectionResetError:
+        # The viewer went away
+        pass
+    return response
+
+@routes.get('/metrics')
+async def metrics(request):
+    """Expose the bot service's metrics in the Prometheus text format"""
+    try:
+        text = await control.metrics()
+    except ServiceUnavailable as e:
+        return web.Response(text=str(e), status=503)
+    return web.Response(
+        body=text.encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+@routes.get('/debug/traces')
+async def debug_traces(request):
+    """Latest /play traces with per-stage p50/p95/p99 timings"""
+    try:
+        traces = await control.traces(query_int(request, 'limit', 20))
+    except ServiceUnavailable as e:
+        return web.json_response({"error": str(e)}, status=503)
+    return web.json_response(traces, dumps=lambda data: json.dumps(data, default=str))
+
+async def close_control(app):
+    await control.close()
+
+# Stateless web app, any number of gunicorn workers can serve it
+app = web.Application()
+app.add_routes(routes)
+app.on_cleanup.append(close_control)
 
 if __name__ == "__main__":
-    # Create templates directory if it doesn't exist
-    os.makedirs('templates', exist_ok=True)
-    
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5000)
+    # Development: run the bot service in this process too
+    from service import start_service
+    from helpers.runtime import runtime
+
+    async def start_local_service(app):
+        app['service'] = await start_service()
+
+    async def stop_local_service(app):
+        await runtime.stop()
+        await app['service'].cleanup()
+
+    app.on_startup.append(start_local_service)
+    app.on_cleanup.append(stop_local_service)
+    web.run_app(app, host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
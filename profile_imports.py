@@ -0,0 +1,94 @@
+"""
+Import-time profile of the bot's modules
+
+Every module is imported on its own in a fresh interpreter started with
+`python -X importtime`. Each total therefore includes everything the module
+pulls in, except what Python itself loads at startup. The slowest modules
+imported along the way are listed beneath each total.
+
+Run from the repository root:
+
+    python profile_imports.py
+    python profile_imports.py main bot --top 10
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Heavy third-party dependencies of the bot, profiled after the repo's own modules
+DEPENDENCIES = ["pyrogram", "pytgcalls", "yt_dlp", "aiohttp", "jinja2"]
+
+def default_modules():
+    """Entry points, every helper module, the bot and its heavy dependencies"""
+    helpers = sorted(
+        f"helpers.{name[:-3]}"
+        for name in os.listdir(os.path.join(ROOT, "helpers"))
+        if name.endswith(".py")
+    )
+    return ["config", "main", "service"] + helpers + ["bot"] + DEPENDENCIES
+
+def profile(module):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        (total_us, [(self_us, name), ...], error); error is None on success
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    total = 0
+    imported = []
+    error = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            if line.strip():
+                error = line.strip()
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # Column headers
+            continue
+        name = fields[2].strip()
+        imported.append((self_us, name))
+        if name == module:
+            total = cumulative_us
+    if result.returncode == 0:
+        error = None
+    return total, imported, error
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the import of each module")
+    parser.add_argument("modules", nargs="*", help="modules to profile (default: all)")
+    parser.add_argument("--top", type=int, default=5, help="slowest imported modules listed per module")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules or default_modules():
+        total, imported, error = profile(module)
+        results.append((module, total, imported, error))
+
+    print(f"{'module':<28} {'import ms':>10}  modules loaded")
+    for module, total, imported, error in results:
+        if error is not None:
+            print(f"{module:<28} {'failed':>10}  {error}")
+            continue
+        print(f"{module:<28} {total / 1000:>10.1f}  {len(imported)}")
+        slowest = sorted((entry for entry in imported if entry[1] != module), reverse=True)
+        for self_us, name in slowest[:args.top]:
+            print(f"    {name:<40} {self_us / 1000:>8.1f} ms self")
+
+    failed = [module for module, _, _, error in results if error is not None]
+    if failed:
+        print(f"\nFailed to import: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import signal
+import asyncio
+import logging
+from config import Config
+from helpers.runtime import runtime
+from helpers.control import serve_control
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def start_service():
+    """Serve the control API, preload the bot's dependencies and start it if configured to"""
+    runner = await serve_control(runtime)
+    runtime.warm_up()
+    if Config.BOT_AUTOSTART:
+        runtime.start()
+    return runner
+
+async def main():
+    """Long-lived bot service: the Telegram clients and call engine live here, once"""
+    runner = await start_service()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Stopping bot service")
+    await runtime.stop()
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,14 @@
+#!/bin/bash
+# Run the bot service once, next to the stateless web workers that talk to it
+python service.py &
+gunicorn main:app \
+    --worker-class aiohttp.GunicornWebWorker \
+    --bind 0.0.0.0:${PORT:-5000} \
+    --workers ${WEB_CONCURRENCY:-2} &
+
+trap 'kill -TERM $(jobs -p) 2>/dev/null' TERM INT
+
+# When either one exits, stop the other so the container or dyno restarts both
+wait -n
+kill -TERM $(jobs -p) 2>/dev/null
+wait
@@ -0,0 +1,32 @@
+"""
+Tests against the offline fakes in benchmarks/fakes.py
+
+Run from the repository root:
+
+    python -m unittest
+
+The scratch configuration and the fakes are installed here, before any
+test module imports config.py or the bot.
+"""
+import os
+import atexit
+import shutil
+import tempfile
+from benchmarks import fakes
+
+workdir = tempfile.mkdtemp(prefix="musicbot-test-")
+atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+os.environ.update({
+    'API_ID': "1",
+    'API_HASH': "test",
+    'BOT_TOKEN': "test",
+    'SESSION_STRINGS': "assistant0",
+    'WORKER_PROCESSES': "1",
+    'TEMP_DOWNLOAD_DIRECTORY': os.path.join(workdir, "downloads", ""),
+    'QUEUE_DB_PATH': "",
+    'CACHE_DB_PATH': "",
+    'AUDIO_CACHE_FORMAT': "native",
+    'LOUDNESS_NORMALIZATION': "false",
+})
+os.environ.pop('WORKER_INDEX', None)
+fakes.install()
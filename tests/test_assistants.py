@@ -0,0 +1,33 @@
+import unittest
+from unittest import mock
+from benchmarks import fakes
+from helpers.assistants import AssistantPool
+from helpers.stream_helper import NoActiveGroupCall, leave_call, pause_stream, start_stream
+
+async def no_active_call(self, chat_id, stream):
+    raise Exception("No active group call")
+
+class AssignmentTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.assistants = AssistantPool(["assistant0", "assistant1"])
+
+    async def test_control_commands_do_not_assign(self):
+        with self.assertRaises(NoActiveGroupCall):
+            await pause_stream(self.assistants, -1001)
+        await leave_call(self.assistants, -1001)
+        self.assertEqual(self.assistants.assignments, {})
+
+    async def test_leaving_and_failed_joins_release(self):
+        await start_stream(self.assistants, -1001, "song.webm")
+        self.assertIn(-1001, self.assistants.assignments)
+        await leave_call(self.assistants, -1001)
+        self.assertEqual(self.assistants.assignments, {})
+
+        with mock.patch.object(fakes.PyTgCalls, "join_group_call", no_active_call):
+            with self.assertRaises(Exception):
+                await start_stream(self.assistants, -1002, "song.webm")
+        self.assertEqual(self.assistants.assignments, {})
+        self.assertEqual(self.assistants.stats(), {0: 0, 1: 0})
+
+if __name__ == "__main__":
+    unittest.main()
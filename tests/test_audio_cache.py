@@ -0,0 +1,18 @@
+import unittest
+from benchmarks import fakes
+from helpers import youtube
+from helpers.audio_cache import audio_cache
+
+class HitRatioTest(unittest.IsolatedAsyncioTestCase):
+    async def test_download_then_replay_counts_one_miss_and_one_hit(self):
+        url = "https://www.youtube.com/watch?v=" + fakes.video_id_for("hit ratio")
+        hits, misses = audio_cache.hits, audio_cache.misses
+
+        first = await youtube.get_stream_source(url)
+        second = await youtube.get_stream_source(url)
+
+        self.assertEqual(first, second)
+        self.assertEqual((audio_cache.hits - hits, audio_cache.misses - misses), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import asyncio
+import unittest
+from helpers.chat_actor import ChatActor
+
+class ChatActorCancellationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_command_does_not_stop_the_mailbox(self):
+        actor = ChatActor(coalesce_window=0)
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        async def value(result):
+            return result
+
+        first = asyncio.ensure_future(actor.submit(1, cancelled))
+        second = asyncio.ensure_future(actor.submit(1, value, "next"))
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(await asyncio.wait_for(second, 1), "next")
+
+    async def test_cancelled_actor_releases_waiting_senders(self):
+        actor = ChatActor(coalesce_window=0)
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        running = asyncio.ensure_future(actor.submit(1, hang))
+        waiting = asyncio.ensure_future(actor.submit(1, hang))
+        await started.wait()
+        actor._workers[1].cancel()
+
+        for future in (running, waiting):
+            with self.assertRaises(asyncio.CancelledError):
+                await asyncio.wait_for(future, 1)
+        self.assertEqual(actor.stats(), {'active_chats': 0, 'queued_commands': 0})
+
+if __name__ == "__main__":
+    unittest.main()
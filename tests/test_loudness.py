@@ -0,0 +1,29 @@
+import sys
+import json
+import unittest
+import subprocess
+from unittest import mock
+from helpers import loudness
+
+# Builds the command with the real PyTgCalls, the fakes are installed in this process
+BUILD_COMMAND = """
+import sys, json
+from pytgcalls.ffmpeg import build_command
+from pytgcalls.types.raw import AudioParameters
+print(json.dumps(build_command("ffmpeg", sys.argv[1], "song.webm", AudioParameters())))
+"""
+
+class VolumeParametersTest(unittest.TestCase):
+    def test_volume_filter_is_an_output_option(self):
+        with mock.patch.object(loudness.Config, "LOUDNESS_NORMALIZATION", True), \
+                mock.patch.object(loudness.audio_cache, "get_gain", return_value=-3.5):
+            parameters = loudness.volume_parameters("song.webm")
+
+        result = subprocess.run([sys.executable, "-c", BUILD_COMMAND, parameters], capture_output=True, text=True)
+        if result.returncode != 0:
+            self.skipTest(f"PyTgCalls is not available: {result.stderr.strip().splitlines()[-1:]}")
+        command = json.loads(result.stdout)
+        self.assertGreater(command.index("volume=-3.5dB"), command.index("-i"))
+
+if __name__ == "__main__":
+    unittest.main()
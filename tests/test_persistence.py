@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+import unittest
+from helpers.persistence import QueueStore
+
+class QueueStoreRestartTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="musicbot-store-")
+        self.store = QueueStore(os.path.join(self.workdir, "queues.db"), flush_interval=0.01)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_writer_runs_again_after_close(self):
+        self.store.start()
+        self.store.close()
+
+        self.store.start()
+        self.assertTrue(self.store._thread.is_alive())
+        self.store.save(-1001, [{'title': "song"}])
+        self.store.close()
+        self.assertEqual(self.store.load_all(), {-1001: [{'title': "song"}]})
+
+if __name__ == "__main__":
+    unittest.main()
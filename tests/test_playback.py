@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+from benchmarks import fakes
+
+# Songs keep playing for the whole test
+fakes.Latency.song_length = 60
+
+import bot
+
+async def no_active_call(self, chat_id, stream):
+    raise Exception("No active group call")
+
+class PlayAfterFailureTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await bot.bot.start()
+        await bot.assistants.start()
+        await bot.start_pytgcalls()
+
+    async def play(self, chat_id, query):
+        await bot.play_command(bot.bot, fakes.Message(chat_id, f"/play {query}", user_id=1))
+
+    async def test_play_starts_after_no_call(self):
+        chat_id = -1001
+
+        # No voice chat yet: the song fails and must not stay queued
+        with mock.patch.object(fakes.PyTgCalls, "join_group_call", no_active_call):
+            await self.play(chat_id, "fixture song 1")
+        self.assertTrue(bot.queue_manager.is_empty(chat_id))
+
+        # Once the voice chat exists, the next /play starts at once
+        started = fakes.counters['songs_started']
+        await self.play(chat_id, "fixture song 2")
+        self.assertEqual(fakes.counters['songs_started'], started + 1)
+        self.assertEqual(len(bot.queue_manager.get_queue(chat_id)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
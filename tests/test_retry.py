@@ -0,0 +1,29 @@
+import unittest
+from unittest import mock
+from helpers import youtube
+from helpers.executor import JobTimeout
+from helpers.retry import FailureScheduler
+
+class TimeoutClassificationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_wrapped_download_timeout_is_not_retried(self):
+        scheduler = FailureScheduler(negative_ttl=0)
+        attempts = 0
+
+        async def download():
+            nonlocal attempts
+            attempts += 1
+            with mock.patch.object(youtube.ytdl_executor, "run", side_effect=JobTimeout("Timed out after 300 seconds")):
+                await youtube._download_audio("https://www.youtube.com/watch?v=0123456789a", "0123456789a", 0)
+
+        with self.assertRaises(Exception) as raised:
+            await scheduler.run(download)
+        self.assertEqual(attempts, 1)
+
+        # As wrapped again by change_stream
+        try:
+            raise Exception(f"Failed to change stream: {raised.exception}") from raised.exception
+        except Exception as e:
+            self.assertEqual(scheduler.classify(e), 'timeout')
+
+if __name__ == "__main__":
+    unittest.main()